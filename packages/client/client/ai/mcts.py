@@ -1,20 +1,23 @@
 import time
 import random
 import math
-import copy
 import pickle
 import os
 from typing import List, Optional
 
-from core.game import Game
+from core.game import NO_CAPTURE_LIMIT, Game
 from ai.ai import AI
 from ai.move import Move
+from ai.opening_book import OpeningBook
+from ai.tablebase import TablebaseSet
+from ai.vec_game import VecGame
 from core.piece import Color
 
 
 class MCTSNode:
-    def __init__(self, game, parent=None, move=None, player_color=None):
-        self.game = copy.deepcopy(game)
+    def __init__(self, game=None, parent=None, move=None, player_color=None):
+        # only the root keeps a Game; the search replays moves on it in place
+        self.game: Optional[Game] = game.clone() if game is not None else None
         self.parent = parent
         self.move = move
         self.player_color = player_color
@@ -29,18 +32,19 @@ class MCTSNode:
         state["parent"] = None
         return state
 
-    def get_untried_moves(self, ai):
+    def get_game_definitely(self) -> Game:
+        if self.game is None:
+            raise RuntimeError("Invariant not upheld: only the root node keeps a game")
+        return self.game
+
+    def get_untried_moves(self, game):
         if self.untried_moves is None:
             next_color = self.player_color
-            self.untried_moves = ai._get_all_possible_moves(self.game, next_color)
+            self.untried_moves = game.legal_moves(next_color)
         return self.untried_moves
 
     def add_child(self, move, next_color):
-        game_copy = copy.deepcopy(self.game)
-
-        game_copy.move(move.piece, move.to_pos)
-
-        child = MCTSNode(game_copy, parent=self, move=move, player_color=next_color)
+        child = MCTSNode(parent=self, move=move, player_color=next_color)
         self.children.append(child)
         return child
 
@@ -66,13 +70,21 @@ class MCTSAI(AI):
         simulation_depth=50,
         exploration_constant=1.41,
         checkpoint_path: Optional[str] = None,
+        batch_size=32,
+        tablebase_path: Optional[str] = None,
+        opening_book_path: Optional[str] = None,
     ):
         self.color = color
         self.num_simulations = num_simulations
         self.simulation_depth = simulation_depth
         self.exploration_constant = exploration_constant
+        # số lá được rollout cùng lúc bằng VecGame; 1 = rollout tuần tự
+        self.batch_size = batch_size
         self.opponent_color = Color.BLUE if color == Color.RED else Color.RED
         self.tree_root = None
+        # tablebase tàn cuộc (tuỳ chọn): thế cờ đã giải thì không cần mô phỏng
+        self.tablebase = TablebaseSet(tablebase_path) if tablebase_path else None
+        self.opening_book = OpeningBook.open(opening_book_path) if opening_book_path else None
 
         if checkpoint_path and os.path.exists(checkpoint_path):
             self.load_checkpoint(checkpoint_path)
@@ -80,43 +92,52 @@ class MCTSAI(AI):
     def choose_move(self, game: Game) -> Optional[Move]:
         start_time = time.time()
 
-        if self.tree_root is None or not self._is_state_compatible(
-            self.tree_root.game, game
-        ):
+        if self.opening_book is not None:
+            move = self.opening_book.choose(game)
+            if move is not None:
+                best_move = Move(*game.unpack_move(move))
+                self.tree_root = None
+                print(f"Best move: {best_move} from opening book")
+                return best_move
+
+        if self.tablebase is not None:
+            move = self.tablebase.best_move(game)
+            if move is not None:
+                best_move = Move(*game.unpack_move(move))
+                self.tree_root = None
+                print(f"Best move: {best_move} from tablebase")
+                return best_move
+
+        root = self._find_reusable_root(game)
+        if root is None:
             root = MCTSNode(game, player_color=self.color)
-            self.tree_root = root
         else:
             print("Reusing existing MCTS tree")
-            root = self.tree_root
-
-        for _ in range(self.num_simulations):
-            node = root
-
-            # Selection phase
-            while node.children and not node.get_untried_moves(self):
-                node = node.select_child()
-
-            # Expansion phase
-            if node.get_untried_moves(self):
-                next_color = (
-                    self.opponent_color
-                    if node.player_color == self.color
-                    else self.color
-                )
+        self.tree_root = root
 
-                move = random.choice(node.get_untried_moves(self))
-                node.untried_moves.remove(move)
+        board = root.get_game_definitely()
+        simulations = 0
+        while simulations < self.num_simulations:
+            if self.batch_size > 1:
+                size = min(self.batch_size, self.num_simulations - simulations)
+                self._run_batch(root, board, size)
+                simulations += size
+                continue
 
-                node = node.add_child(move, next_color)
+            node, records = self._select_and_expand(root, board)
 
             # Simulation phase
-            result = self._simulate(node)
+            result = self._simulate(node, board)
+
+            for record in reversed(records):
+                board.unmake_move(record)
 
             # Backpropagation phase
             while node:
                 node.update(result)
                 node = node.parent
                 result = 1 - result
+            simulations += 1
 
         if not root.children:
             return None
@@ -124,6 +145,9 @@ class MCTSAI(AI):
         best_child = max(root.children, key=lambda c: c.visits)
 
         # Update the root to the chosen child for future use
+        board.make_move(best_child.move.piece, best_child.move.to_pos)
+        best_child.game = board
+        root.game = None
         self.tree_root = best_child
         # Detach from parent to avoid memory issues
         self.tree_root.parent = None
@@ -141,63 +165,164 @@ class MCTSAI(AI):
     def _is_state_compatible(self, saved_game, current_game):
         """Check if the saved game state matches the current game state"""
         try:
-            saved_state = saved_game.get_state()
-            current_state = current_game.get_state()
-
-            return saved_state == current_state
+            return saved_game.get_hash() == current_game.get_hash()
         except:
             return False
 
-    def _get_all_possible_moves(self, game, color: Color) -> List[Move]:
-        moves = []
-        state = game.get_state()
+    def _find_reusable_root(self, game):
+        """Return the saved root, or the child reached by the opponent's reply, if it matches `game`"""
+        root = self.tree_root
+        if root is None or root.game is None:
+            return None
+        if self._is_state_compatible(root.game, game):
+            return root
+
+        for child in root.children:
+            record = root.game.make_move(child.move.piece, child.move.to_pos)
+            if self._is_state_compatible(root.game, game):
+                child.game = root.game
+                child.parent = None
+                root.game = None
+                return child
+            root.game.unmake_move(record)
+        return None
+
+    def _select_and_expand(self, root, board):
+        """Walk down to a leaf on `board` and expand it; returns the leaf and the moves to undo"""
+        node = root
+        records = []
+
+        # Selection phase
+        while node.children and not node.get_untried_moves(board):
+            node = node.select_child()
+            records.append(board.make_move(node.move.piece, node.move.to_pos))
+
+        # Expansion phase
+        if node.get_untried_moves(board):
+            next_color = (
+                self.opponent_color
+                if node.player_color == self.color
+                else self.color
+            )
+
+            move = random.choice(node.get_untried_moves(board))
+            node.untried_moves.remove(move)
+
+            records.append(board.make_packed_move(move))
+            node = node.add_child(Move(*board.unpack_move(move)), next_color)
+
+        return node, records
+
+    def _run_batch(self, root, board, size):
+        """Select `size` leaves, then roll them all out at once with VecGame"""
+        leaves = []
+        encoded = []
+        clocks = []
+        known = []
+        for _ in range(size):
+            node, records = self._select_and_expand(root, board)
+            encoded.append(board.to_bytes())
+            clocks.append(board.get_no_capture_plies())
+            known.append(self._known_result(board))
+            for record in reversed(records):
+                board.unmake_move(record)
+            leaves.append(node)
+
+            # Virtual loss: count the visit now so the rest of the batch
+            # is steered towards other leaves
+            visited = node
+            while visited:
+                visited.visits += 1
+                visited = visited.parent
+
+        results = self._simulate_batch(encoded, clocks, board.no_capture_limit)
+        # lá đã hoà (kể cả do lặp thế cờ, VecGame không theo dõi) hoặc có trong
+        # tablebase thì dùng kết quả đã biết thay cho rollout
+        results = [result if exact is None else exact for result, exact in zip(results, known)]
+
+        # Backpropagation phase (visits were already added)
+        for node, result in zip(leaves, results):
+            while node:
+                node.wins += result
+                node = node.parent
+                result = 1 - result
 
-        for piece in state.get_all_pieces():
-            if piece.color == color and state.is_alive(piece):
-                possible_cells = game.get_possible_moves(piece)
-                for cell in possible_cells:
-                    moves.append(Move(piece, cell.position))
+    def _simulate_batch(self, encoded, clocks=None, no_capture_limit=NO_CAPTURE_LIMIT) -> List[float]:
+        games = VecGame(
+            encoded,
+            seed=random.getrandbits(32),
+            no_capture_plies=clocks,
+            no_capture_limit=no_capture_limit,
+        )
+        games.run(self.simulation_depth)
+
+        counts = games.piece_counts()
+        results = []
+        for winner, drawn, count in zip(games.winner.tolist(), games.drawn.tolist(), counts.tolist()):
+            if winner == self.color.value:
+                results.append(1.0)
+            elif winner == self.opponent_color.value:
+                results.append(0.0)
+            elif drawn:
+                results.append(0.5)
+            else:
+                our_pieces = count[self.color.value]
+                total_pieces = count[0] + count[1]
+                results.append(0.5 if total_pieces == 0 else our_pieces / total_pieces)
+        return results
+
+    def _known_result(self, game) -> Optional[float]:
+        """Exact result of a drawn or tablebase position, from this AI's side"""
+        if game.is_draw():
+            return 0.5
+        if self.tablebase is None:
+            return None
+        result = self.tablebase.probe(game)
+        if result is None:
+            return None
+        if result.winner is None:
+            return 0.5
+        return 1.0 if result.winner == self.color else 0.0
 
-        return moves
+    def _simulate(self, node, sim_game):
+        known = self._known_result(sim_game)
+        if known is not None:
+            return known
 
-    def _simulate(self, node):
-        sim_game = copy.deepcopy(node.game)
         current_color = node.player_color
-
+        records = []
         for _ in range(self.simulation_depth):
             winner = sim_game.is_game_over()
-            if winner is not None:
+            if winner is not None or sim_game.is_draw():
                 break
 
-            moves = self._get_all_possible_moves(sim_game, current_color)
+            moves = sim_game.legal_moves(current_color)
             if not moves:
                 break
 
-            move = random.choice(moves)
-            sim_game.move(move.piece, move.to_pos)
+            records.append(sim_game.make_packed_move(random.choice(moves)))
 
             current_color = (
                 self.opponent_color if current_color == self.color else self.color
             )
 
+        result = self._score(sim_game)
+        for record in reversed(records):
+            sim_game.unmake_move(record)
+        return result
+
+    def _score(self, sim_game) -> float:
         winner = sim_game.is_game_over()
         if winner == self.color:
             return 1.0
         elif winner == self.opponent_color:
             return 0.0
+        elif sim_game.is_draw():
+            return 0.5
         else:
             state = sim_game.get_state()
-
-            our_pieces = sum(
-                1
-                for piece in state.get_all_pieces()
-                if piece.color == self.color and state.is_alive(piece)
-            )
-            opponent_pieces = sum(
-                1
-                for piece in state.get_all_pieces()
-                if piece.color == self.opponent_color and state.is_alive(piece)
-            )
+            our_pieces = state.get_piece_count(self.color)
+            opponent_pieces = state.get_piece_count(self.opponent_color)
 
             total_pieces = our_pieces + opponent_pieces
             if total_pieces == 0:
@@ -210,6 +335,7 @@ class MCTSAI(AI):
             "num_simulations": self.num_simulations,
             "simulation_depth": self.simulation_depth,
             "exploration_constant": self.exploration_constant,
+            "batch_size": self.batch_size,
             "tree_root": self.tree_root,
         }
 
@@ -228,6 +354,7 @@ class MCTSAI(AI):
             "num_simulations": self.num_simulations,
             "simulation_depth": self.simulation_depth,
             "exploration_constant": self.exploration_constant,
+            "batch_size": self.batch_size,
         }
 
         with open(path, "wb") as f:
@@ -249,6 +376,7 @@ class MCTSAI(AI):
             self.exploration_constant = checkpoint_data.get(
                 "exploration_constant", self.exploration_constant
             )
+            self.batch_size = checkpoint_data.get("batch_size", self.batch_size)
 
             if "tree_root" in checkpoint_data:
                 self.tree_root = checkpoint_data["tree_root"]
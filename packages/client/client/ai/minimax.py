@@ -2,126 +2,449 @@ import time
 import random
 from typing import List, Optional
 from core.game import Game
+from core.move_cache import MoveCache
 from ai.ai import AI
 from ai.move import Move
-from core.piece import Color, PieceType
-import copy
+from ai.opening_book import OpeningBook
+from ai.tablebase import TablebaseSet
+from ai.transposition import EXACT, LOWER, NO_MOVE, UPPER, TranspositionTable
+from core.piece import PIECES, Color
+from core.state import MATERIAL, State
+
+
+# điểm khi thắng; thắng sau n nước (tablebase) là WIN_SCORE - n
+WIN_SCORE = 1000
+# nửa độ rộng cửa sổ aspiration quanh điểm của độ sâu trước
+ASPIRATION_WINDOW = 25
+# một nước đi (kể cả nhảy qua sông) đổi khoảng cách tới hang / tới giữa bàn
+# của quân đi không quá số ô này; dùng cho delta pruning
+MAX_MOVE_DISTANCE = 4
+
+
+class _SearchAborted(Exception):
+    pass
 
 
 class MinimaxAI(AI):
-    def __init__(self, color: Color, max_depth: int = 3):
+    def __init__(
+        self,
+        color: Color,
+        max_depth: int = 3,
+        tablebase_path: Optional[str] = None,
+        opening_book_path: Optional[str] = None,
+        tt_megabytes: float = 16,
+        time_limit: Optional[float] = None,
+        node_limit: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
         self.color = color
+        # độ sâu tối đa; với time_limit (giây) hoặc node_limit thì dừng sớm hơn
+        # và dùng kết quả của độ sâu cuối cùng đã tìm xong
         self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.__deadline: Optional[float] = None
+        self.__budget_active = False
+        self.__root_depth = 0
+        # thứ tự nước đi: 2 killer mỗi ply, history theo nước đi packed
+        self.__killers: List[List[int]] = []
+        self.__history = [0] * 1024
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
         self.nodes_evaluated = 0
+        self.researches = 0
+        self.quiescence_nodes = 0
+        # chọn ngẫu nhiên giữa các nước bằng điểm; seed cố định cho ván lặp lại được
+        self.__rng = random.Random(seed)
         self.opponent_color = Color.BLUE if color == Color.RED else Color.RED
-        self.piece_values = {
-            PieceType.ELEPHANT: 8,
-            PieceType.LION: 7,
-            PieceType.TIGER: 6,
-            PieceType.LEOPARD: 5,
-            PieceType.WOLF: 4,
-            PieceType.DOG: 3,
-            PieceType.CAT: 2,
-            PieceType.MOUSE: 1,
-        }
+        # giá trị quân là core.state.MATERIAL (voi 8 ... chuột 1)
+        self.material_weight = 10
         self.den_distance_weight = 3
         self.center_control_weight = 1
+        # giữ qua các lượt: thế cờ của lượt trước thường gặp lại
+        self.move_cache = MoveCache()
+        # bảng chuyển vị, giữ qua các lượt; tt_megabytes giới hạn bộ nhớ
+        self.transposition_table = TranspositionTable(tt_megabytes)
+        # tablebase tàn cuộc (tuỳ chọn), xem ai.tablebase
+        self.tablebase = TablebaseSet(tablebase_path) if tablebase_path else None
+        self.opening_book = OpeningBook.open(opening_book_path) if opening_book_path else None
 
     def choose_move(self, game: Game) -> Optional[Move]:
         self.nodes_evaluated = 0
+        self.researches = 0
+        self.quiescence_nodes = 0
         start_time = time.time()
         all_moves = self._get_all_possible_moves(game, self.color)
         if not all_moves:
             return None
 
-        # Store all moves with their scores
-        move_scores = []
-        best_score = float("-inf")
+        if self.opening_book is not None:
+            move = self.opening_book.choose(game, self.__rng)
+            if move is not None:
+                best_move = Move(*game.unpack_move(move))
+                print(f"Best move: {best_move} from opening book")
+                return best_move
 
-        for move in all_moves:
-            game_copy = copy.deepcopy(game)
-            game_copy.move(move.piece, move.to_pos)
-            score = self._minimax(
-                game_copy, self.max_depth - 1, False, float("-inf"), float("inf")
-            )
-            move_scores.append((move, score))
-            if score > best_score:
-                best_score = score
+        if self.tablebase is not None:
+            move = self.tablebase.best_move(game)
+            if move is not None:
+                best_move = Move(*game.unpack_move(move))
+                print(f"Best move: {best_move} from tablebase")
+                return best_move
 
-        best_moves = [move for move, score in move_scores if score == best_score]
+        # search runs in place on one copy, using make_move / unmake_move
+        self.transposition_table.new_search()
+        self.move_cache.reset_stats()
+        game = game.clone()
+        game.move_cache = self.move_cache
+        self.__deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        self.__budget_active = False
+        self.__killers = []
+        self.__history = [0] * 1024
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
 
-        best_move = random.choice(best_moves)
+        # Iterative deepening: each completed depth orders the root moves of the
+        # next one; if the budget runs out, keep the last completed depth
+        root_moves = list(all_moves)
+        best_score = 0.0
+        best_moves: List[Move] = []
+        completed_depth = 0
+        for depth in range(1, self.max_depth + 1):
+            # độ sâu 1 luôn chạy hết để chắc chắn có nước đi
+            self.__budget_active = depth > 1
+            self.__root_depth = depth
+            # Aspiration: search around the previous score first and repeat with
+            # a full window only when the result falls outside it
+            if depth > 1 and abs(best_score) < WIN_SCORE - self.max_depth:
+                alpha, beta = best_score - ASPIRATION_WINDOW, best_score + ASPIRATION_WINDOW
+            else:
+                alpha, beta = float("-inf"), float("inf")
+            try:
+                while True:
+                    score, tied, root_moves = self.__search_root(game, root_moves, depth, alpha, beta)
+                    if alpha <= score < beta:
+                        break
+                    self.researches += 1
+                    alpha, beta = float("-inf"), float("inf")
+            except _SearchAborted:
+                break
+            best_score, best_moves = score, tied
+            completed_depth = depth
+            if best_score >= WIN_SCORE - self.max_depth:
+                break  # đã tìm được nước thắng
+
+        # giữ thứ tự sinh nước đi để lựa chọn ngẫu nhiên không phụ thuộc vào thứ tự tìm kiếm
+        best_moves = [move for move in all_moves if move in best_moves]
+
+        best_move = self.__rng.choice(best_moves)
 
         end_time = time.time()
+        tt = self.transposition_table
         print(
-            f"Minimax AI evaluated {self.nodes_evaluated} nodes in {end_time - start_time:.2f} seconds"
+            f"Minimax AI evaluated {self.nodes_evaluated} nodes in {end_time - start_time:.2f} seconds "
+            f"(depth {completed_depth}, TT {tt.hits}/{tt.probes} hits, {tt.hit_rate():.1%}, "
+            f"{self.researches} re-searches, {self.quiescence_nodes} quiescence nodes, "
+            f"move cache {self.move_cache.hits}/{self.move_cache.hits + self.move_cache.misses} hits, "
+            f"{self.move_cache.hit_rate():.1%})"
         )
+        if self.cutoffs:
+            # hệ số phân nhánh hiệu dụng: nodes ^ (1 / depth)
+            print(
+                f"Cutoffs: {self.cutoffs}, {self.first_move_cutoffs / self.cutoffs:.1%} on the first move, "
+                f"effective branching factor {self.nodes_evaluated ** (1 / max(completed_depth, 1)):.2f}"
+            )
         print(f"Best move: {best_move} with score: {best_score}")
         print(f"Selected from {len(best_moves)} equally good moves")
 
         return best_move
 
+    def __search_root(self, game: Game, root_moves: List[Move], depth: int, alpha: float, beta: float):
+        """Search the root moves with one shared alpha.
+
+        The first move gets the window (alpha - 1, beta); every later move is
+        first asked with a null window whether it reaches the best score so
+        far, and only searched exactly when it does. So every move scoring at
+        least the best is known exactly and ties are proven, not guessed.
+        Returns the best score, the moves tied at it and the root moves
+        reordered for the next depth. A best score outside [alpha, beta) is
+        only a bound.
+        """
+        best_score = float("-inf")
+        tied: List[Move] = []
+        scores = []
+        for index, move in enumerate(root_moves):
+            record = game.make_move(move.piece, move.to_pos)
+            if index == 0:
+                score = self._minimax(game, depth - 1, False, alpha - 1, beta)
+            else:
+                score = self._minimax(game, depth - 1, False, alpha - 1, alpha)
+                if alpha <= score < beta:
+                    score = self._minimax(game, depth - 1, False, alpha - 1, beta)
+            game.unmake_move(record)
+            scores.append((move, score))
+            if score > best_score:
+                best_score, tied = score, [move]
+            elif score == best_score:
+                tied.append(move)
+            if score >= beta:
+                break  # vượt cửa sổ aspiration, sẽ tìm lại
+            alpha = max(alpha, score)
+        # các nước chưa tìm (do vượt cửa sổ) giữ nguyên thứ tự ở cuối
+        searched = [move for move, _ in sorted(scores, key=lambda ms: ms[1], reverse=True)]
+        return best_score, tied, searched + root_moves[len(scores):]
+
     def _minimax(
         self, game: Game, depth: int, is_maximizing: bool, alpha: float, beta: float
     ) -> float:
         self.nodes_evaluated += 1
+        if self.__budget_active and self.__out_of_budget():
+            raise _SearchAborted()
         winner = game.is_game_over()
         if winner is not None:
-            return 1000 if winner == self.color else -1000
+            return WIN_SCORE if winner == self.color else -WIN_SCORE
+        if game.is_draw():
+            return 0
+        if self.tablebase is not None:
+            result = self.tablebase.probe(game)
+            if result is not None:
+                # thắng nhanh hơn / thua chậm hơn thì tốt hơn
+                if result.winner is None:
+                    return 0
+                return WIN_SCORE - result.plies if result.winner == self.color else result.plies - WIN_SCORE
         if depth == 0:
-            return self._evaluate_board(game)
+            return self._quiescence(game, is_maximizing, alpha, beta)
+
+        key = game.get_hash()
+        best_move = NO_MOVE
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            best_move = entry.move
+            if entry.depth >= depth:
+                if entry.bound == EXACT:
+                    return entry.score
+                if entry.bound == LOWER:
+                    alpha = max(alpha, entry.score)
+                else:
+                    beta = min(beta, entry.score)
+                if beta <= alpha:
+                    return entry.score
+
+        alpha_orig, beta_orig = alpha, beta
+        ply = self.__root_depth - depth
+        moves = self._order_moves(
+            game, game.legal_moves(self.color if is_maximizing else self.opponent_color), best_move, ply
+        )
 
         if is_maximizing:
-            max_eval = float("-inf")
-            moves = self._get_all_possible_moves(game, self.color)
-            for move in moves:
-                game_copy = copy.deepcopy(game)
-                game_copy.move(move.piece, move.to_pos)
-                eval = self._minimax(game_copy, depth - 1, False, alpha, beta)
-                max_eval = max(max_eval, eval)
+            best_eval = float("-inf")
+            for index, move in enumerate(moves):
+                record = game.make_packed_move(move)
+                if index == 0:
+                    eval = self._minimax(game, depth - 1, False, alpha, beta)
+                else:
+                    # PVS: cửa sổ rỗng, chỉ tìm lại khi nước này tốt hơn alpha
+                    eval = self._minimax(game, depth - 1, False, alpha, alpha + 1)
+                    if alpha < eval < beta:
+                        eval = self._minimax(game, depth - 1, False, alpha, beta)
+                game.unmake_move(record)
+                if eval > best_eval:
+                    best_eval, best_move = eval, move
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self.__record_cutoff(game, move, index, depth, ply)
                     break
-            return max_eval
         else:
-            min_eval = float("inf")
-            moves = self._get_all_possible_moves(game, self.opponent_color)
-            for move in moves:
-                game_copy = copy.deepcopy(game)
-                game_copy.move(move.piece, move.to_pos)
-                eval = self._minimax(game_copy, depth - 1, True, alpha, beta)
-                min_eval = min(min_eval, eval)
+            best_eval = float("inf")
+            for index, move in enumerate(moves):
+                record = game.make_packed_move(move)
+                if index == 0:
+                    eval = self._minimax(game, depth - 1, True, alpha, beta)
+                else:
+                    eval = self._minimax(game, depth - 1, True, beta - 1, beta)
+                    if alpha < eval < beta:
+                        eval = self._minimax(game, depth - 1, True, alpha, beta)
+                game.unmake_move(record)
+                if eval < best_eval:
+                    best_eval, best_move = eval, move
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self.__record_cutoff(game, move, index, depth, ply)
                     break
-            return min_eval
 
-    def _get_all_possible_moves(self, game: Game, color: Color) -> List[Move]:
-        moves = []
+        if best_eval <= alpha_orig:
+            bound = UPPER
+        elif best_eval >= beta_orig:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.transposition_table.store(key, depth, best_eval, bound, best_move)
+        return best_eval
+
+    def _quiescence(self, game: Game, is_maximizing: bool, alpha: float, beta: float) -> float:
+        """Search only captures and den entries until the position is quiet.
+
+        The side to move may stand pat on the static evaluation, unless the
+        opponent could enter its den next move: a den cannot be occupied by
+        its owner, so the only defence is to capture the threatening piece,
+        and every capture is searched with the loss as the fallback score.
+        Otherwise a capture is skipped when even the victim's whole share of
+        the evaluation plus the mover's largest positional change cannot move
+        the score past alpha (or beta), unless it lands next to the enemy den. Every capture removes a piece and a
+        den entry ends the game, so the search always terminates.
+        """
+        winner = game.is_game_over()
+        if winner is not None:
+            return WIN_SCORE if winner == self.color else -WIN_SCORE
+        if game.is_draw():
+            return 0
+
+        state = game.get_state()
+        map = state.get_map()
+        color = self.color if is_maximizing else self.opponent_color
+        captures = []
+        for move in game.legal_moves(color):
+            square = move & 63
+            if map.get_cell(square).location.cave_color is not None:
+                # vào hang là thắng ngay
+                return WIN_SCORE if is_maximizing else -WIN_SCORE
+            if state.get_piece_at_square(square) >= 0:
+                captures.append(move)
+
+        threatened = self.__has_den_entry(game, self.opponent_color if is_maximizing else self.color)
+        if threatened:
+            # không được đứng yên: không ăn được quân đe doạ là thua
+            stand_pat = -WIN_SCORE if is_maximizing else WIN_SCORE
+            moves = captures
+        else:
+            stand_pat = self._evaluate_board(game)
+            if is_maximizing:
+                if stand_pat >= beta:
+                    return stand_pat
+                alpha = max(alpha, stand_pat)
+            else:
+                if stand_pat <= alpha:
+                    return stand_pat
+                beta = min(beta, stand_pat)
+
+            # delta pruning: bỏ nước ăn quân không thể đưa điểm vượt alpha (beta)
+            margin = MAX_MOVE_DISTANCE * (self.den_distance_weight + self.center_control_weight)
+            victim_color = self.opponent_color if is_maximizing else self.color
+            moves = []
+            for move in captures:
+                square = move & 63
+                # ăn quân ngay cạnh hang đối phương có thể dẫn tới vào hang, không bỏ
+                if state.get_square_distances(color, square)[0] <= 1:
+                    moves.append(move)
+                    continue
+                victim = state.get_piece_at_square(square)
+                den, centre = state.get_square_distances(victim_color, square)
+                gain = (
+                    MATERIAL[victim] * self.material_weight
+                    + (9 - den) * self.den_distance_weight
+                    + (9 - centre) * self.center_control_weight
+                    + margin
+                )
+                if is_maximizing and stand_pat + gain <= alpha:
+                    continue
+                if not is_maximizing and stand_pat - gain >= beta:
+                    continue
+                moves.append(move)
+
+        best_eval = stand_pat
+        for move in self._order_moves(game, moves, NO_MOVE, self.__root_depth):
+            self.nodes_evaluated += 1
+            self.quiescence_nodes += 1
+            if self.__budget_active and self.__out_of_budget():
+                raise _SearchAborted()
+            record = game.make_packed_move(move)
+            eval = self._quiescence(game, not is_maximizing, alpha, beta)
+            game.unmake_move(record)
+            if is_maximizing:
+                best_eval = max(best_eval, eval)
+                alpha = max(alpha, eval)
+            else:
+                best_eval = min(best_eval, eval)
+                beta = min(beta, eval)
+            if beta <= alpha:
+                break
+        return best_eval
+
+    def __has_den_entry(self, game: Game, color: Color) -> bool:
         state = game.get_state()
-        for piece in state.get_all_pieces():
-            if piece.color == color and state.is_alive(piece):
-                possible_cells = game.get_possible_moves(piece)
-                for cell in possible_cells:
-                    moves.append(Move(piece, cell.position))
-        return moves
+        # chỉ quân cách hang đối phương tối đa 1 hàng mới có thể vào hang
+        first = color.value * 8
+        for index in range(first, first + 8):
+            square = state.get_piece_square(index)
+            if square >= 0 and state.get_square_distances(color, square)[0] <= 1:
+                break
+        else:
+            return False
+        map = state.get_map()
+        return any(map.get_cell(move & 63).location.cave_color is not None for move in game.legal_moves(color))
+
+    def _order_moves(self, game: Game, moves: List[int], tt_move: int, ply: int) -> List[int]:
+        """Best-first order: TT move, den entries, captures (MVV-LVA), killers, then history."""
+        state = game.get_state()
+        map = state.get_map()
+        killers = self.__killers[ply] if ply < len(self.__killers) else ()
+        history = self.__history
+
+        def key(move: int) -> int:
+            if move == tt_move:
+                return 1 << 30
+            square = move & 63
+            if map.get_cell(square).location.cave_color is not None:
+                return 1 << 29
+            victim = state.get_piece_at_square(square)
+            if victim >= 0:
+                # quân bị ăn cấp cao trước, rồi quân ăn cấp thấp trước
+                return (1 << 28) + (
+                    game.get_current_level(PIECES[victim]) * 16 - game.get_current_level(PIECES[move >> 6])
+                )
+            if move in killers:
+                return (1 << 27) - killers.index(move)
+            return history[move]
+
+        return sorted(moves, key=key, reverse=True)
+
+    def __record_cutoff(self, game: Game, move: int, index: int, depth: int, ply: int):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        # killer và history chỉ dành cho nước đi không ăn quân
+        if game.get_state().get_piece_at_square(move & 63) >= 0:
+            return
+        while len(self.__killers) <= ply:
+            self.__killers.append([])
+        killers = self.__killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.__history[move] += depth * depth
+
+    def __out_of_budget(self) -> bool:
+        if self.node_limit is not None and self.nodes_evaluated >= self.node_limit:
+            return True
+        # đọc đồng hồ mỗi 256 nút
+        return (
+            self.__deadline is not None
+            and self.nodes_evaluated & 255 == 0
+            and time.perf_counter() >= self.__deadline
+        )
+
+    def _get_all_possible_moves(self, game: Game, color: Color) -> List[Move]:
+        return [Move(*game.unpack_move(move)) for move in game.legal_moves(color)]
 
     def _evaluate_board(self, game: Game) -> float:
+        # dùng các tổng State cập nhật dần, không phải duyệt lại 16 quân;
+        # đối xứng giữa hai bên để thế cân bằng (và hoà) có điểm 0
         state = game.get_state()
-        score = 0
-        for piece in state.get_all_pieces():
-            if not state.is_alive(piece):
-                continue
-            value = self.piece_values[piece.type] * 10
-            if piece.color == self.color:
-                score += value
-                pos = state.get_piece_position_definitely(piece)
-                enemy_den_y = 0 if self.color == Color.BLUE else 8
-                distance_to_den = abs(pos.y - enemy_den_y)
-                score += (9 - distance_to_den) * self.den_distance_weight
-                center_x, center_y = 3, 4
-                center_dist = abs(pos.x - center_x) + abs(pos.y - center_y)
-                score += (9 - center_dist) * self.center_control_weight
-            else:
-                score -= value
-        return score
+        score = (state.get_material(self.color) - state.get_material(self.opponent_color)) * self.material_weight
+        return score + self.__positional(state, self.color) - self.__positional(state, self.opponent_color)
+
+    def __positional(self, state: State, color: Color) -> float:
+        count = state.get_piece_count(color)
+        return (9 * count - state.get_den_distance(color)) * self.den_distance_weight + (
+            9 * count - state.get_centre_distance(color)
+        ) * self.center_control_weight
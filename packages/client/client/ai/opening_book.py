@@ -0,0 +1,156 @@
+"""Opening book built from recorded games.
+
+Games are recorded one per line as the result (RED, BLUE or DRAW)
+followed by the packed moves (`piece_index << 6 | square`), e.g. by
+`train.self_play_training(games_path=...)`. The book keeps, for every
+position (Zobrist key) met in the first plies, how often each move was
+played and how many half points it scored. Records are sorted by key and
+written with a fixed size, so a lookup is a binary search over an mmap.
+
+Build from packages/client/client:
+
+    python -m ai.opening_book games.txt ai/checkpoints/opening_book.bin
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from core.game import Game
+from core.piece import Color
+
+MAGIC = b"ACOB"
+VERSION = 1
+# magic, version, số bản ghi
+HEADER = struct.Struct("<4sIQ")
+# khoá Zobrist, nước đi, số lần đi, số nửa điểm (thắng 2, hoà 1)
+RECORD = struct.Struct("<QHII")
+
+
+class BookMove(NamedTuple):
+    move: int
+    played: int
+    score: int
+
+
+class RecordedGame(NamedTuple):
+    winner: Optional[Color]
+    moves: List[int]
+
+
+def format_game(winner: Optional[Color], moves: List[int]) -> str:
+    result = winner.name if winner is not None else "DRAW"
+    return " ".join([result] + [str(move) for move in moves])
+
+
+def read_games(path: str) -> Iterable[RecordedGame]:
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            winner = None if fields[0] == "DRAW" else Color[fields[0]]
+            yield RecordedGame(winner, [int(move) for move in fields[1:]])
+
+
+def build_book(
+    games: Iterable[RecordedGame], max_plies: int = 16, min_count: int = 2
+) -> List[Tuple[int, int, int, int]]:
+    """Sorted (key, move, count, score) records of the first `max_plies` plies."""
+    stats: Dict[Tuple[int, int], List[int]] = {}
+    for recorded in games:
+        game = Game()
+        for move in recorded.moves[:max_plies]:
+            turn = game.get_turn()
+            if move not in game.legal_moves(turn):
+                raise ValueError(f"Illegal move {move} in recorded game")
+            entry = stats.setdefault((game.get_hash(), move), [0, 0])
+            entry[0] += 1
+            if recorded.winner is None:
+                entry[1] += 1
+            elif recorded.winner == turn:
+                entry[1] += 2
+            game.make_packed_move(move)
+
+    return sorted(
+        (key, move, count, score) for (key, move), (count, score) in stats.items() if count >= min_count
+    )
+
+
+def write_book(path: str, records: List[Tuple[int, int, int, int]]):
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+
+
+class OpeningBook:
+    """Read-only view of a book file through mmap."""
+
+    size: int
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size = HEADER.unpack_from(self.__mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an opening book")
+        if len(self.__mmap) != HEADER.size + self.size * RECORD.size:
+            raise ValueError(f"{path} is truncated")
+
+    @staticmethod
+    def open(path: str) -> Optional["OpeningBook"]:
+        """The book at `path`, or None when there is no such file."""
+        return OpeningBook(path) if os.path.isfile(path) else None
+
+    def __key_at(self, index: int) -> int:
+        return struct.unpack_from("<Q", self.__mmap, HEADER.size + index * RECORD.size)[0]
+
+    def lookup(self, game: Game) -> List[BookMove]:
+        key = game.get_hash()
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.__key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        for index in range(low, self.size):
+            record_key, move, played, score = RECORD.unpack_from(self.__mmap, HEADER.size + index * RECORD.size)
+            if record_key != key:
+                break
+            moves.append(BookMove(move, played, score))
+        return moves
+
+    def choose(self, game: Game, rng: Optional[random.Random] = None) -> Optional[int]:
+        """Random book move weighted by the half points it scored; None when out of book.
+
+        `rng` defaults to the module-level generator.
+        """
+        # kiểm tra lại nước đi để phòng trùng khoá Zobrist
+        legal = set(game.legal_moves(game.get_turn()))
+        moves = [book_move for book_move in self.lookup(game) if book_move.move in legal and book_move.score > 0]
+        if not moves:
+            return None
+        choices = rng.choices if rng is not None else random.choices
+        return choices([m.move for m in moves], weights=[m.score for m in moves])[0]
+
+    def close(self):
+        self.__mmap.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an opening book from recorded games")
+    parser.add_argument("games", help="recorded games, one per line")
+    parser.add_argument("out", help="output book file")
+    parser.add_argument("--max-plies", type=int, default=16)
+    parser.add_argument("--min-count", type=int, default=2)
+    args = parser.parse_args()
+
+    records = build_book(read_games(args.games), args.max_plies, args.min_count)
+    write_book(args.out, records)
+    print(f"{len(records)} book moves written to {args.out}")
@@ -0,0 +1,394 @@
+"""Endgame tablebases: retrograde solver and memory-mapped probing.
+
+A table covers one material signature: the exact set of live pieces,
+their level bonuses and both upgrade counters. Every placement of those
+pieces and both sides to move are stored as one little-endian int16,
+from the side to move's point of view:
+
+    1 + n     win, the game ends n plies from now
+    -(1 + n)  loss in n plies
+    0         draw (or an unreachable placement)
+
+Repetition and no-capture draws are not part of the tables.
+
+Generate tables offline, e.g. from packages/client/client:
+
+    python -m ai.tablebase --out ai/checkpoints/tablebases RED:LION BLUE:TIGER BLUE:MOUSE
+
+Captures lead to smaller signatures, which are solved first and written
+alongside.
+"""
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+from core.bitboard import DEFAULT_MASKS, SQUARES, BoardMasks
+from core.game import Game
+from core.piece import PIECES, Color, Piece, PieceType
+from core.zobrist import MAX_LEVEL_BONUS
+
+MAGIC = b"ACTB"
+VERSION = 1
+# magic, version, số quân, số lần nâng cấp của đỏ và xanh, chỉ số quân, level bonus
+HEADER = struct.Struct("<4sBBBB16s16s")
+HEADER_SIZE = 64
+MAX_UPGRADES = 3
+
+_NONE = -1
+_FIXED = -2
+
+
+class Signature(NamedTuple):
+    pieces: Tuple[int, ...]  # chỉ số quân còn sống, tăng dần
+    bonus: Tuple[int, ...]  # level bonus của từng quân trong pieces
+    upgrades: Tuple[int, int]  # số lần nâng cấp của đỏ, xanh
+
+    def file_name(self) -> str:
+        pieces = "-".join(str(index) for index in self.pieces)
+        bonus = "".join(str(bonus) for bonus in self.bonus)
+        return f"tb_{pieces}_{bonus}_{self.upgrades[0]}{self.upgrades[1]}.bin"
+
+    def size(self) -> int:
+        return SQUARES ** len(self.pieces) * 2
+
+
+class TablebaseResult(NamedTuple):
+    winner: Optional[Color]  # None: hoà
+    plies: int  # số nước (ply) tới khi kết thúc khi cả hai chơi tối ưu
+
+
+def signature_of(game: Game) -> Signature:
+    state = game.get_state()
+    pieces = tuple(index for index in range(len(PIECES)) if state.get_piece_square(index) >= 0)
+    return Signature(
+        pieces,
+        tuple(game.level_bonus[PIECES[index]] for index in pieces),
+        (game.upgrades_by_color[Color.RED], game.upgrades_by_color[Color.BLUE]),
+    )
+
+
+def _index(squares, turn: int) -> int:
+    index = 0
+    for square in squares:
+        index = index * SQUARES + square
+    return index * 2 + turn
+
+
+def _decode(value: int, turn: Color) -> TablebaseResult:
+    if value > 0:
+        return TablebaseResult(turn, value - 1)
+    if value < 0:
+        return TablebaseResult(Color.BLUE if turn == Color.RED else Color.RED, -value - 1)
+    return TablebaseResult(None, 0)
+
+
+class Tablebase:
+    """One table file, probed through a read-only mmap."""
+
+    signature: Signature
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, red, blue, pieces, bonus = HEADER.unpack_from(self.__mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a tablebase file")
+        self.signature = Signature(tuple(pieces[:count]), tuple(bonus[:count]), (red, blue))
+        if len(self.__mmap) != HEADER_SIZE + 2 * self.signature.size():
+            raise ValueError(f"{path} is truncated")
+
+    def probe_squares(self, squares, turn: Color) -> int:
+        """Raw stored value for `squares` (in signature piece order)."""
+        offset = HEADER_SIZE + 2 * _index(squares, turn.value)
+        return int.from_bytes(self.__mmap[offset : offset + 2], "little", signed=True)
+
+    def probe(self, game: Game) -> TablebaseResult:
+        state = game.get_state()
+        squares = [state.get_piece_square(index) for index in self.signature.pieces]
+        return _decode(self.probe_squares(squares, game.get_turn()), game.get_turn())
+
+    def close(self):
+        self.__mmap.close()
+
+
+class TablebaseSet:
+    """All tables found in a directory, looked up by the signature of a game."""
+
+    max_pieces: int
+
+    def __init__(self, directory: str):
+        self.__tables: Dict[Signature, Tablebase] = {}
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.startswith("tb_") and name.endswith(".bin"):
+                    table = Tablebase(os.path.join(directory, name))
+                    self.__tables[table.signature] = table
+        self.max_pieces = max((len(sig.pieces) for sig in self.__tables), default=0)
+
+    def __len__(self) -> int:
+        return len(self.__tables)
+
+    def probe(self, game: Game) -> Optional[TablebaseResult]:
+        """Exact result of `game`, or None when no table covers it."""
+        state = game.get_state()
+        if state.get_piece_count(Color.RED) + state.get_piece_count(Color.BLUE) > self.max_pieces:
+            return None
+        winner = game.is_game_over()
+        if winner is not None:
+            return TablebaseResult(winner, 0)
+        table = self.__tables.get(signature_of(game))
+        if table is None:
+            return None
+        return table.probe(game)
+
+    def best_move(self, game: Game) -> Optional[int]:
+        """Packed move that wins fastest, draws, or loses slowest; None if any reply is not covered."""
+        turn = game.get_turn()
+        if self.probe(game) is None:
+            return None
+
+        game = game.clone()
+        game.move_cache = None
+        best_move, best_key = None, None
+        for move in game.legal_moves(turn):
+            record = game.make_packed_move(move)
+            result = self.probe(game)
+            game.unmake_move(record)
+            if result is None:
+                return None
+            if result.winner == turn:
+                key = (2, -result.plies)
+            elif result.winner is None:
+                key = (1, 0)
+            else:
+                key = (0, result.plies)
+            if best_key is None or key > best_key:
+                best_move, best_key = move, key
+        return best_move
+
+
+def _piece_targets(index: int, masks: BoardMasks) -> List[Tuple[int, ...]]:
+    # ô đích theo từng ô xuất phát, đã bỏ sông (trừ chuột) và hang nhà
+    piece = PIECES[index]
+    jumper = piece.type == PieceType.LION or piece.type == PieceType.TIGER
+    forbidden = masks.den[piece.color.value] | (0 if piece.type == PieceType.MOUSE else masks.river)
+    table = masks.jumps if jumper else masks.steps
+    return [
+        tuple(target for target in range(SQUARES) if table[square] >> target & 1 and not forbidden >> target & 1)
+        for square in range(SQUARES)
+    ]
+
+
+def _can_capture(attacker: int, attacker_level: int, defender: int, defender_level: int) -> bool:
+    # cùng luật với Game ngoài bẫy
+    attacker_type = PIECES[attacker].type
+    defender_type = PIECES[defender].type
+    if attacker_type == PieceType.MOUSE and defender_type == PieceType.ELEPHANT:
+        return True
+    if attacker_type == PieceType.ELEPHANT and defender_type == PieceType.MOUSE:
+        return False
+    return attacker_level >= defender_level
+
+
+def _after_capture(sig: Signature, attacker: int, defender: int) -> Signature:
+    """Signature once slot `attacker` has taken slot `defender`."""
+    color = PIECES[sig.pieces[attacker]].color.value
+    levels = [PIECES[index].get_default_level().value + bonus for index, bonus in zip(sig.pieces, sig.bonus)]
+    bonus = list(sig.bonus)
+    upgrades = list(sig.upgrades)
+    if levels[attacker] >= levels[defender] and upgrades[color] < MAX_UPGRADES:
+        bonus[attacker] += 1
+        upgrades[color] += 1
+    return Signature(
+        sig.pieces[:defender] + sig.pieces[defender + 1 :],
+        tuple(bonus[:defender] + bonus[defender + 1 :]),
+        (upgrades[0], upgrades[1]),
+    )
+
+
+class Generator:
+    """Retrograde solver; keeps every solved table in memory as a NumPy array."""
+
+    def __init__(self, masks: BoardMasks = DEFAULT_MASKS):
+        self.masks = masks
+        self.tables: Dict[Signature, np.ndarray] = {}
+        self.positions = 0
+        self.seconds = 0.0
+        self.__targets = [_piece_targets(index, masks) for index in range(len(PIECES))]
+
+    def solve(self, sig: Signature) -> np.ndarray:
+        table = self.tables.get(sig)
+        if table is not None:
+            return table
+
+        colors = [PIECES[index].color.value for index in sig.pieces]
+        if Color.RED.value not in colors or Color.BLUE.value not in colors:
+            raise ValueError("Both colors need at least one piece")
+        if any(bonus > MAX_LEVEL_BONUS for bonus in sig.bonus):
+            raise ValueError("Invalid level bonus")
+
+        # bảng con sau mỗi kiểu ăn quân phải giải trước
+        children: Dict[Tuple[int, int], Optional[Signature]] = {}
+        for attacker, defender in itertools.permutations(range(len(sig.pieces)), 2):
+            if colors[attacker] == colors[defender]:
+                continue
+            child = _after_capture(sig, attacker, defender)
+            if colors.count(colors[defender]) == 1:
+                children[attacker, defender] = None  # đối phương hết quân
+            else:
+                children[attacker, defender] = child
+                self.solve(child)
+
+        start = time.perf_counter()
+        table = self.__solve(sig, colors, children)
+        self.seconds += time.perf_counter() - start
+        self.positions += sig.size()
+        self.tables[sig] = table
+        return table
+
+    def __solve(self, sig: Signature, colors: List[int], children) -> np.ndarray:
+        masks = self.masks
+        k = len(sig.pieces)
+        size = sig.size()
+        slots = 4 * max(colors.count(0), colors.count(1))
+        strides = [SQUARES ** (k - 1 - slot) * 2 for slot in range(k)]
+        levels = [PIECES[index].get_default_level().value + bonus for index, bonus in zip(sig.pieces, sig.bonus)]
+        captures = [
+            [colors[a] != colors[d] and _can_capture(sig.pieces[a], levels[a], sig.pieces[d], levels[d]) for d in range(k)]
+            for a in range(k)
+        ]
+        targets = [self.__targets[index] for index in sig.pieces]
+        dens = masks.den[0] | masks.den[1]
+        child_tables = {key: self.tables[child] for key, child in children.items() if child is not None}
+
+        # mỗi ô con: succ >= 0 là vị trí trong bảng này, FIXED là giá trị đã biết
+        # nằm trong fixed (vào hang, ăn quân sang bảng con), NONE là không có nước
+        value = np.zeros(size, dtype=np.int16)
+        succ = np.full((size, slots), _NONE, dtype=np.int32)
+        fixed = np.zeros((size, slots), dtype=np.int16)
+        pending = np.zeros(size, dtype=bool)
+
+        for squares in itertools.product(range(SQUARES), repeat=k):
+            if len(set(squares)) != k:
+                continue
+            base = sum(square * stride for square, stride in zip(squares, strides))
+
+            in_den = [slot for slot in range(k) if dens >> squares[slot] & 1]
+            if in_den:
+                winner = colors[in_den[0]]
+                value[base] = 1 if winner == 0 else -1
+                value[base + 1] = 1 if winner == 1 else -1
+                continue
+
+            occupant = {square: slot for slot, square in enumerate(squares)}
+            for turn in (0, 1):
+                index = base + turn
+                trap = masks.trap[turn]
+                n = 0
+                for slot in range(k):
+                    if colors[slot] != turn:
+                        continue
+                    square = squares[slot]
+                    for target in targets[slot][square]:
+                        defender = occupant.get(target)
+                        if defender is not None:
+                            if colors[defender] == turn:
+                                continue
+                            if not (trap >> target & 1 or captures[slot][defender]):
+                                continue
+                        if dens >> target & 1:
+                            succ[index, n] = _FIXED
+                            fixed[index, n] = -1
+                        elif defender is None:
+                            succ[index, n] = base + (target - square) * strides[slot] + 1 - turn
+                        elif children[slot, defender] is None:
+                            succ[index, n] = _FIXED
+                            fixed[index, n] = -1
+                        else:
+                            rest = list(squares)
+                            rest[slot] = target
+                            del rest[defender]
+                            succ[index, n] = _FIXED
+                            fixed[index, n] = child_tables[slot, defender][_index(rest, 1 - turn)]
+                        n += 1
+                if n == 0:
+                    value[index] = -1
+                else:
+                    pending[index] = True
+
+        present = succ != _NONE
+        longest = int(np.abs(fixed).max(initial=0))
+        depth = 1
+        while True:
+            rows = np.nonzero(pending)[0]
+            if rows.size == 0:
+                break
+            row_succ = succ[rows]
+            child = np.where(row_succ >= 0, value[np.maximum(row_succ, 0)], fixed[rows])
+            row_present = present[rows]
+
+            win = ((child == -depth) & row_present).any(axis=1)
+            all_won = (~row_present | (child > 0)).all(axis=1)
+            loss = ~win & all_won & (np.where(row_present, child, 0).max(axis=1) == depth)
+
+            value[rows[win]] = depth + 1
+            value[rows[loss]] = -(depth + 1)
+            pending[rows[win | loss]] = False
+            if not (win.any() or loss.any()) and depth >= longest:
+                break
+            depth += 1
+        return value
+
+    def write(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for sig, table in self.tables.items():
+            header = HEADER.pack(
+                MAGIC,
+                VERSION,
+                len(sig.pieces),
+                sig.upgrades[0],
+                sig.upgrades[1],
+                bytes(sig.pieces).ljust(16, b"\xff"),
+                bytes(sig.bonus).ljust(16, b"\x00"),
+            )
+            with open(os.path.join(directory, sig.file_name()), "wb") as f:
+                f.write(header.ljust(HEADER_SIZE, b"\x00"))
+                f.write(table.astype("<i2").tobytes())
+
+
+def _parse_piece(text: str) -> int:
+    color, _, piece_type = text.upper().partition(":")
+    return Piece(Color[color], PieceType[piece_type]).index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases by retrograde analysis")
+    parser.add_argument("pieces", nargs="+", help="pieces as COLOR:TYPE, e.g. RED:LION BLUE:MOUSE")
+    parser.add_argument("--bonus", type=int, nargs="*", help="level bonus of each piece (default 0)")
+    parser.add_argument("--upgrades", type=int, nargs=2, default=[0, 0], metavar=("RED", "BLUE"))
+    parser.add_argument("--out", required=True, help="output directory")
+    args = parser.parse_args()
+
+    pieces = [_parse_piece(text) for text in args.pieces]
+    bonus = args.bonus or [0] * len(pieces)
+    if len(bonus) != len(pieces) or len(set(pieces)) != len(pieces):
+        raise SystemExit("Expected one bonus per piece and no repeated piece")
+    order = sorted(range(len(pieces)), key=lambda slot: pieces[slot])
+    sig = Signature(
+        tuple(pieces[slot] for slot in order),
+        tuple(bonus[slot] for slot in order),
+        (args.upgrades[0], args.upgrades[1]),
+    )
+
+    generator = Generator()
+    generator.solve(sig)
+    generator.write(args.out)
+    print(
+        f"{len(generator.tables)} tables, {generator.positions} positions in {generator.seconds:.1f}s "
+        f"({generator.positions / generator.seconds:.0f} positions/s)"
+    )
@@ -2,6 +2,7 @@ from core.game import Game
 from core.map import Color
 from ai.mcts import MCTSAI
 from ai.minimax import MinimaxAI
+from ai.opening_book import format_game
 
 
 def self_play_training(
@@ -9,6 +10,7 @@ def self_play_training(
     max_moves=300,
     mcts_checkpoint=None,
     save_checkpoints=True,
+    games_path=None,
 ):
     minimax_ai = MinimaxAI(Color.RED, max_depth=3)
     mcts_ai = MCTSAI(Color.BLUE, num_simulations=500, checkpoint_path=mcts_checkpoint)
@@ -26,6 +28,11 @@ def self_play_training(
                 results[winner.name] += 1
                 print(f"Game {game_num + 1}: {winner.name} wins in {move_num} moves")
                 break
+            reason = game.get_draw_reason()
+            if reason is not None:
+                results["DRAW"] += 1
+                print(f"Game {game_num + 1}: Draw ({reason}) after {move_num} moves")
+                break
 
             if current_color == Color.RED:
                 move = minimax_ai.choose_move(game)
@@ -49,6 +56,11 @@ def self_play_training(
                 f"Game {game_num + 1}: Draw (move limit reached) after {max_moves} moves"
             )
 
+        # ghi lại ván đấu để dựng opening book (ai.opening_book)
+        if games_path:
+            with open(games_path, "a") as f:
+                f.write(format_game(game.is_game_over(), game.get_move_history()) + "\n")
+
     print("\nTraining Results:")
     print(f"Games played: {num_games}")
     print(
@@ -0,0 +1,82 @@
+from array import array
+from typing import NamedTuple, Optional
+
+# loại cận của điểm đã lưu
+EXACT = 0
+LOWER = 1  # điểm thật >= score (cắt beta)
+UPPER = 2  # điểm thật <= score (không vượt được alpha)
+
+NO_MOVE = 0xFFFF
+
+
+class TTEntry(NamedTuple):
+    depth: int
+    score: float
+    bound: int
+    move: int  # nước tốt nhất dạng packed, NO_MOVE nếu không có
+
+
+class TranspositionTable:
+    """Fixed-size table of search results keyed by Zobrist hash.
+
+    Entries live in flat typed arrays, so the memory use is fixed by
+    `max_megabytes`. A slot is overwritten by a search at least as deep,
+    or by any search once its entry is from an older generation.
+    """
+
+    # khoá 8 + điểm 8 + độ sâu 1 + cận 1 + thế hệ 1 + nước đi 2
+    ENTRY_SIZE = 21
+
+    def __init__(self, max_megabytes: float = 16):
+        count = max(1024, int(max_megabytes * 1024 * 1024) // self.ENTRY_SIZE)
+        count = 1 << (count.bit_length() - 1)
+        self.__mask = count - 1
+        self.__keys = array("Q", bytes(8 * count))
+        self.__scores = array("d", bytes(8 * count))
+        self.__depths = array("b", b"\xff" * count)  # -1 = ô trống
+        self.__bounds = array("B", bytes(count))
+        self.__generations = array("B", bytes(count))
+        self.__moves = array("H", bytes(2 * count))
+        self.__generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def __len__(self) -> int:
+        return self.__mask + 1
+
+    def new_search(self):
+        """Start a new generation; older entries become replaceable."""
+        self.__generation = (self.__generation + 1) & 0xFF
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        count = len(self)
+        self.__depths = array("b", b"\xff" * count)
+        self.new_search()
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        self.probes += 1
+        slot = key & self.__mask
+        if self.__depths[slot] < 0 or self.__keys[slot] != key:
+            return None
+        self.hits += 1
+        return TTEntry(self.__depths[slot], self.__scores[slot], self.__bounds[slot], self.__moves[slot])
+
+    def store(self, key: int, depth: int, score: float, bound: int, move: int):
+        slot = key & self.__mask
+        old_depth = self.__depths[slot]
+        if depth < old_depth and self.__generations[slot] == self.__generation:
+            return
+        self.__keys[slot] = key
+        self.__scores[slot] = score
+        self.__depths[slot] = depth
+        self.__bounds[slot] = bound
+        self.__generations[slot] = self.__generation
+        self.__moves[slot] = move
+        self.stores += 1
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
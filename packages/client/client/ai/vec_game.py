@@ -0,0 +1,228 @@
+from typing import List, Optional
+import numpy as np
+
+from core.game import ENCODED_SIZE, CAPTURED_SQUARE, NO_CAPTURE_LIMIT, Game
+from core.map import DEFAULT_MAP, Map
+from core.piece import PIECES, Color, PieceType
+
+# Thuộc tính của 16 quân theo chỉ số, và của 8 quân trong một phe
+_TYPES = np.array([piece.type.value for piece in PIECES], dtype=np.int16)
+_TYPES8 = _TYPES[:8]
+_IS_MOUSE8 = _TYPES8 == PieceType.MOUSE.value
+_IS_ELEPHANT8 = _TYPES8 == PieceType.ELEPHANT.value
+_IS_JUMPER8 = (_TYPES8 == PieceType.LION.value) | (_TYPES8 == PieceType.TIGER.value)
+
+# Ô 63 là ô "ngoài bàn cờ": luôn trống, dùng thay cho đích -1
+_OFF_BOARD = 63
+
+
+class _MapTables:
+    def __init__(self, map: Map):
+        squares = map.width() * map.height()
+        if squares != _OFF_BOARD:
+            raise ValueError("VecGame only supports 7x9 maps")
+
+        self.steps = np.full((squares, 4), -1, dtype=np.int16)
+        self.jumps = np.full((squares, 4), -1, dtype=np.int16)
+        self.river = np.zeros(squares + 1, dtype=bool)
+        self.den = np.full(squares + 1, -1, dtype=np.int16)
+        self.trap = np.full(squares + 1, -1, dtype=np.int16)
+
+        width = map.width()
+        for square in range(squares):
+            cell = map.get_cell(square)
+            pos = cell.position
+            self.river[square] = cell.location.is_river
+            if cell.location.cave_color is not None:
+                self.den[square] = cell.location.cave_color.value
+            if cell.location.trap_color is not None:
+                self.trap[square] = cell.location.trap_color.value
+
+            steps = (map.get_left_cell(pos), map.get_right_cell(pos), map.get_up_cell(pos), map.get_down_cell(pos))
+            jumps = (
+                map.get_non_river_left_cell(pos),
+                map.get_non_river_right_cell(pos),
+                map.get_non_river_up_cell(pos),
+                map.get_non_river_down_cell(pos),
+            )
+            for direction in range(4):
+                for table, target in ((self.steps, steps[direction]), (self.jumps, jumps[direction])):
+                    if target is not None:
+                        table[square, direction] = target.position.y * width + target.position.x
+
+
+_DEFAULT_TABLES = _MapTables(DEFAULT_MAP)
+
+
+class VecGame:
+    """N independent games stored as NumPy arrays and stepped together.
+
+    Every step plays one uniformly random legal move in each unfinished
+    game, with the same rules as core.game.Game. It is meant for MCTS
+    rollouts, where the same random playout is run for many leaves.
+    Only the no-capture draw rule is applied; repetitions are not tracked.
+    """
+
+    squares: np.ndarray  # (N, 16) ô của từng quân, -1 nếu đã chết
+    board: np.ndarray  # (N, 64) chỉ số quân trên từng ô, -1 nếu trống
+    levels: np.ndarray  # (N, 16) cấp hiện tại (mặc định + bonus)
+    upgrades: np.ndarray  # (N, 2) số lần nâng cấp của đỏ, xanh
+    turn: np.ndarray  # (N,) màu tới lượt
+    winner: np.ndarray  # (N,) màu thắng, -1 nếu chưa kết thúc
+    no_capture: np.ndarray  # (N,) số nước liên tiếp không ăn quân
+    drawn: np.ndarray  # (N,) ván đã hoà vì quá no_capture_limit nước không ăn quân
+
+    def __init__(
+        self,
+        encoded: List[bytes],
+        map: Map = DEFAULT_MAP,
+        seed: Optional[int] = None,
+        no_capture_plies: Optional[List[int]] = None,
+        no_capture_limit: int = NO_CAPTURE_LIMIT,
+    ):
+        self.__tables = _DEFAULT_TABLES if map is DEFAULT_MAP else _MapTables(map)
+        self.__no_capture_limit = no_capture_limit
+        self.__rng = np.random.default_rng(seed)
+
+        n = len(encoded)
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).reshape(n, ENCODED_SIZE)
+        squares = data[:, :16].astype(np.int16)
+        squares[squares == CAPTURED_SQUARE] = -1
+        self.squares = squares
+        self.levels = _TYPES[None, :] + data[:, 16:32]
+        self.upgrades = data[:, 32:34].astype(np.int16)
+        self.turn = data[:, 34].astype(np.int16)
+
+        self.board = np.full((n, _OFF_BOARD + 1), -1, dtype=np.int16)
+        rows, pieces = np.nonzero(squares >= 0)
+        self.board[rows, squares[rows, pieces]] = pieces
+
+        # quân đứng trong hang (luôn là hang đối phương) thì phe đó thắng
+        self.winner = np.full(n, -1, dtype=np.int16)
+        in_den = self.__tables.den[np.where(squares >= 0, squares, _OFF_BOARD)] >= 0
+        self.winner[in_den[:, 8:].any(axis=1)] = Color.BLUE.value
+        self.winner[in_den[:, :8].any(axis=1)] = Color.RED.value
+
+        if no_capture_plies is None:
+            self.no_capture = np.zeros(n, dtype=np.int16)
+        else:
+            self.no_capture = np.array(no_capture_plies, dtype=np.int16)
+        self.drawn = np.zeros(n, dtype=bool)
+        self.__update_drawn()
+
+    @staticmethod
+    def from_games(games: List[Game], seed: Optional[int] = None) -> "VecGame":
+        return VecGame(
+            [game.to_bytes() for game in games],
+            games[0].get_state().get_map(),
+            seed,
+            [game.get_no_capture_plies() for game in games],
+            games[0].no_capture_limit,
+        )
+
+    def __len__(self) -> int:
+        return len(self.turn)
+
+    def __legal_moves(self, active: np.ndarray):
+        """Legal (piece, direction) slots of the side to move in each active game."""
+        tables = self.__tables
+        turn = self.turn[active]
+        pieces = turn[:, None] * 8 + np.arange(8)
+        squares = np.take_along_axis(self.squares[active], pieces, axis=1)
+        alive = squares >= 0
+
+        origin = np.where(alive, squares, 0)
+        targets = np.where(_IS_JUMPER8[None, :, None], tables.jumps[origin], tables.steps[origin])
+        valid = alive[:, :, None] & (targets >= 0)
+        targets = np.where(valid, targets, _OFF_BOARD)
+
+        valid &= ~tables.river[targets] | _IS_MOUSE8[None, :, None]
+        valid &= tables.den[targets] != turn[:, None, None]
+
+        occupant = self.board[active[:, None, None], targets]
+        empty = occupant < 0
+        defender = np.where(empty, 0, occupant)
+        enemy = ~empty & (defender // 8 != turn[:, None, None])
+
+        attacker_level = np.take_along_axis(self.levels[active], pieces, axis=1)[:, :, None]
+        defender_level = self.levels[active[:, None, None], defender]
+        defender_type = _TYPES[defender]
+        mouse_takes_elephant = _IS_MOUSE8[None, :, None] & (defender_type == PieceType.ELEPHANT.value)
+        elephant_takes_mouse = _IS_ELEPHANT8[None, :, None] & (defender_type == PieceType.MOUSE.value)
+        can_capture = (
+            (tables.trap[targets] == turn[:, None, None])
+            | mouse_takes_elephant
+            | (~elephant_takes_mouse & (attacker_level >= defender_level))
+        )
+        valid &= empty | (enemy & can_capture)
+        return valid, pieces, squares, targets, occupant, attacker_level, defender_level
+
+    def __update_drawn(self):
+        if self.__no_capture_limit:
+            self.drawn |= (self.winner < 0) & (self.no_capture >= self.__no_capture_limit)
+
+    def step(self):
+        """Play one random legal move in every game that is not over or drawn."""
+        active = np.nonzero((self.winner < 0) & ~self.drawn)[0]
+        if active.size == 0:
+            return
+
+        valid, pieces, squares, targets, occupant, attacker_level, defender_level = self.__legal_moves(active)
+        flat = valid.reshape(len(active), 32)
+        has_move = flat.any(axis=1)
+
+        # hết nước đi thì bên kia thắng
+        stuck = active[~has_move]
+        self.winner[stuck] = 1 - self.turn[stuck]
+
+        keys = self.__rng.random(flat.shape)
+        keys[~flat] = -1.0
+        choice = keys.argmax(axis=1)[has_move]
+        rows = np.nonzero(has_move)[0]
+        games = active[has_move]
+        slot, direction = choice // 4, choice % 4
+
+        piece = pieces[rows, slot]
+        origin = squares[rows, slot]
+        target = targets[rows, slot, direction]
+        captured = occupant[rows, slot, direction]
+        color = self.turn[games]
+
+        took = captured >= 0
+        upgraded = (
+            took
+            & (attacker_level[rows, slot, 0] >= defender_level[rows, slot, direction])
+            & (self.upgrades[games, color] < 3)
+        )
+        self.levels[games[upgraded], piece[upgraded]] += 1
+        self.upgrades[games[upgraded], color[upgraded]] += 1
+        self.squares[games[took], captured[took]] = -1
+
+        self.board[games, origin] = -1
+        self.board[games, target] = piece
+        self.squares[games, piece] = target
+        self.turn[games] = 1 - color
+        self.no_capture[games] = np.where(took, 0, self.no_capture[games] + 1)
+
+        entered_den = self.__tables.den[target] >= 0
+        self.winner[games[entered_den]] = color[entered_den]
+        self.__update_drawn()
+
+    def run(self, max_plies: int):
+        for _ in range(max_plies):
+            if ((self.winner >= 0) | self.drawn).all():
+                break
+            self.step()
+
+        # vị trí cuối: bên tới lượt không còn nước đi thì cũng thua (kể cả ván hoà)
+        active = np.nonzero(self.winner < 0)[0]
+        if active.size:
+            valid = self.__legal_moves(active)[0]
+            stuck = active[~valid.reshape(len(active), 32).any(axis=1)]
+            self.winner[stuck] = 1 - self.turn[stuck]
+            self.drawn[stuck] = False
+
+    def piece_counts(self) -> np.ndarray:
+        """(N, 2) number of live red and blue pieces."""
+        alive = self.squares >= 0
+        return np.stack([alive[:, :8].sum(axis=1), alive[:, 8:].sum(axis=1)], axis=1)
@@ -156,5 +156,5 @@ class ServerConnector(ConnectionListener):
     def set_move_made_callback(self, callback: Callable[[Piece, Position, str], None]):
         self.__move_made_callback = callback
 
-    def set_game_over_callback(self, callback: Callable[[str, str], None]):
+    def set_game_over_callback(self, callback: Callable[[Optional[str], str], None]):
         self.__game_over_callback = callback
@@ -63,10 +63,19 @@ class OfflineCvPMatchScene(GameScene):
 
         self.status_message = ""
 
+        tablebase_path = os.path.join(CHECKPOINT_PATH, "tablebases")
+        opening_book_path = os.path.join(CHECKPOINT_PATH, "opening_book.bin")
         if mode == DifficultyMode.EASY:
             self.ai = MinimaxAI(Color.BLUE, 2)
         elif mode == DifficultyMode.MEDIUM:
-            self.ai = MinimaxAI(Color.BLUE, 3)
+            # đi sâu tới 6 nhưng không quá 0.5 giây mỗi nước
+            self.ai = MinimaxAI(
+                Color.BLUE,
+                6,
+                tablebase_path=tablebase_path,
+                opening_book_path=opening_book_path,
+                time_limit=0.5,
+            )
         else:
             self.ai = MCTSAI(
                 Color.BLUE,
@@ -74,6 +83,8 @@ class OfflineCvPMatchScene(GameScene):
                 simulation_depth=50,
                 exploration_constant=1.41,
                 checkpoint_path=os.path.join(CHECKPOINT_PATH, "mcts.pkl"),
+                tablebase_path=tablebase_path,
+                opening_book_path=opening_book_path,
             )
 
         self.textures = {}
@@ -663,6 +674,10 @@ class OfflineCvPMatchScene(GameScene):
             self.status_message = f"{winner.to_string()} won! Game over."
             self.status_text.setText(self.status_message)
             self.game_over = True
+        elif winner is None and not self.game_over and self.game.is_draw():
+            self.status_message = "Draw! Game over."
+            self.status_text.setText(self.status_message)
+            self.game_over = True
 
         if not self.game_over and self.game.get_turn() == Color.BLUE:
             self.ai.play_with_ai(self.game)
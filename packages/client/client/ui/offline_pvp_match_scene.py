@@ -667,8 +667,8 @@ class OfflinePvPMatchScene(GameScene):
         # self.app.accept('mouse1-up', self.on_mouse_up)
 
     def on_mouse_down(self):
-        # 1) Bỏ qua nếu không có chuột
-        if not self.app.mouseWatcherNode.hasMouse():
+        # 1) Bỏ qua nếu không có chuột hoặc ván đã kết thúc
+        if self.game_over or not self.app.mouseWatcherNode.hasMouse():
             return
 
         # 2) Tìm điểm giao mouse → plane Z=0
@@ -836,6 +836,15 @@ class OfflinePvPMatchScene(GameScene):
         self.board_root.removeNode()
 
     def step(self, task):
+        winner = self.game.is_game_over()
+        if winner is not None and not self.game_over:
+            self.status_message = f"{winner.to_string()} won! Game over."
+            self.status_text.setText(self.status_message)
+            self.game_over = True
+        elif winner is None and not self.game_over and self.game.is_draw():
+            self.status_message = "Draw! Game over."
+            self.status_text.setText(self.status_message)
+            self.game_over = True
         return super().step(task)
     
     def return_to_menu(self):
@@ -465,10 +465,14 @@ class OnlinePvPMatchScene(GameScene):
             self.status_text.setText(self.status_message)
             self.update_board_state()
 
-    def on_game_over(self, winner: str, reason: str):
+    def on_game_over(self, winner: Optional[str], reason: str):
         self.game_over = True
         self.winner = winner
-        if winner == str(self.opponent_addr):
+        if winner is None:
+            self.status_message = f"Game over. Draw. Reason: {reason}"
+            self.winner_text.setText("Draw!")
+            self.winner_text.show()
+        elif winner == str(self.opponent_addr):
             self.status_message = f"Game over. You lost. Reason: {reason}"
         else:
             self.status_message = f"Game over. You won! Reason: {reason}"
@@ -503,6 +507,13 @@ class OnlinePvPMatchScene(GameScene):
                 self.status_message = "You lost. Game over."
             self.status_text.setText(self.status_message)
             self.update_game_over_display()
+        elif winner is None and not self.game_over and self.game.is_draw():
+            self.game_over = True
+            self.status_message = "Draw! Game over."
+            self.status_text.setText(self.status_message)
+            self.winner_text.setText("Draw!")
+            self.winner_text.show()
+            self.update_game_over_display()
 
         if (
             self.dragging
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# mã client import theo dạng `ai.x`, `ui.x` từ thư mục packages/client/client
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "client"))
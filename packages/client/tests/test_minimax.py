@@ -0,0 +1,27 @@
+from core.notation import from_notation
+from core.piece import Color
+
+from ai.minimax import WIN_SCORE, MinimaxAI
+
+INF = float("inf")
+
+
+def test_quiescence_keeps_capture_next_to_den():
+    # con chó ăn con mèo ở (3, 7) rồi vào hang xanh; điểm đứng yên thấp hơn alpha
+    game = from_notation("7/e5l/t6/7/7/7/3D3/3c3/7 r 0-0")
+    ai = MinimaxAI(Color.RED, 2)
+    assert ai._quiescence(game, True, 0, INF) == WIN_SCORE
+
+
+def test_quiescence_sees_den_threat_against_side_to_move():
+    # sói xanh ở (3, 1) vào hang đỏ ở nước sau, đỏ không ăn được nó
+    game = from_notation("7/3w3/7/7/7/7/E6/7/6l r 0-0")
+    ai = MinimaxAI(Color.RED, 2)
+    assert ai._quiescence(game, True, -INF, INF) == -WIN_SCORE
+
+
+def test_choose_move_plays_capture_into_den():
+    game = from_notation("7/e5l/t6/7/7/7/3D3/3c3/7 r 0-0")
+    move = MinimaxAI(Color.RED, 2, seed=0).choose_move(game)
+    assert move is not None
+    assert (move.to_pos.x, move.to_pos.y) == (3, 7)
@@ -0,0 +1,41 @@
+"""Micro-benchmarks for core operations.
+
+Run with `python -m core.bench`.
+"""
+import copy
+import random
+import timeit
+from typing import Callable, List
+
+from core.game import Game
+
+
+def sample_positions(count: int, max_plies: int = 60, seed: int = 0) -> List[Game]:
+    """Positions reached by random play from the start position."""
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        game = Game()
+        for _ in range(rng.randint(0, max_plies)):
+            if game.is_game_over() is not None:
+                break
+            game.make_packed_move(rng.choice(game.legal_moves(game.get_turn())))
+        positions.append(game)
+    return positions
+
+
+def time_per_call(func: Callable, games: List[Game], number: int) -> float:
+    """Average seconds per call of `func(game)` over all `games`."""
+    total = timeit.timeit(lambda: [func(game) for game in games], number=number)
+    return total / (number * len(games))
+
+
+def bench_clone(games: List[Game], number: int = 20):
+    deepcopy_time = time_per_call(copy.deepcopy, games, number)
+    clone_time = time_per_call(Game.clone, games, number)
+    print(f"deepcopy: {deepcopy_time * 1e6:8.2f} us/call")
+    print(f"clone:    {clone_time * 1e6:8.2f} us/call ({deepcopy_time / clone_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    bench_clone(sample_positions(50))
@@ -0,0 +1,64 @@
+from typing import Tuple
+from core.map import DEFAULT_MAP, Map
+
+# Ô (x, y) ứng với bit số y * WIDTH + x
+WIDTH = 7
+HEIGHT = 9
+SQUARES = WIDTH * HEIGHT
+
+
+class BoardMasks:
+    """Static masks and step tables of a Map, indexed by square."""
+
+    river: int
+    trap: Tuple[int, int]
+    den: Tuple[int, int]
+    steps: Tuple[int, ...]
+    jumps: Tuple[int, ...]
+
+    def __init__(self, map: Map):
+        if map.width() != WIDTH or map.height() != HEIGHT:
+            raise ValueError("Bitboards only support 7x9 maps")
+
+        river = 0
+        trap = [0, 0]
+        den = [0, 0]
+        for y in range(HEIGHT):
+            for x in range(WIDTH):
+                loc = map.locations[y][x]
+                bit = 1 << (y * WIDTH + x)
+                if loc.is_river:
+                    river |= bit
+                if loc.trap_color is not None:
+                    trap[loc.trap_color.value] |= bit
+                if loc.cave_color is not None:
+                    den[loc.cave_color.value] |= bit
+
+        steps = []
+        jumps = []
+        for sq in range(SQUARES):
+            x, y = sq % WIDTH, sq // WIDTH
+            step = 0
+            jump = 0
+            for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < WIDTH and 0 <= ny < HEIGHT):
+                    continue
+                step |= 1 << (ny * WIDTH + nx)
+                # sư tử và hổ nhảy qua sông tới ô đất liền đầu tiên
+                while 0 <= nx < WIDTH and 0 <= ny < HEIGHT and river >> (ny * WIDTH + nx) & 1:
+                    nx, ny = nx + dx, ny + dy
+                if 0 <= nx < WIDTH and 0 <= ny < HEIGHT:
+                    jump |= 1 << (ny * WIDTH + nx)
+            steps.append(step)
+            jumps.append(jump)
+
+        self.river = river
+        self.trap = (trap[0], trap[1])
+        self.den = (den[0], den[1])
+        self.steps = tuple(steps)
+        self.jumps = tuple(jumps)
+
+
+DEFAULT_MASKS = BoardMasks(DEFAULT_MAP)
+
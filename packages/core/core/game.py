@@ -1,13 +1,79 @@
-from typing import List, Optional, Union
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 from core.map import Cell, Position
-from core.piece import Color, Piece, PieceType
+from core.move_cache import MoveCache
+from core.piece import PIECES, Color, Piece, PieceType
 from core.state import State
+from core import zobrist
+
+
+class MoveRecord(NamedTuple):
+    # đủ thông tin để unmake_move khôi phục chính xác nước đi
+    piece: Piece
+    from_position: Position
+    to_position: Position
+    captured: Optional[Piece]
+    upgraded: bool
+    turn: Color
+    # kết quả is_game_over đã lưu trước nước đi (Color, None hoặc _UNKNOWN)
+    winner: object
+    # số nước liên tiếp không ăn quân trước nước đi
+    no_capture_plies: int
+
+
+# to_bytes: 16 ô của quân (0xFF nếu đã chết), 16 level bonus,
+# số lần nâng cấp của đỏ, xanh và lượt đi
+ENCODED_SIZE = 35
+CAPTURED_SQUARE = 0xFF
+
+# chưa kiểm tra bên tới lượt còn nước đi hay không
+_UNKNOWN = object()
+
+# luật hoà mặc định: lặp lại thế cờ 3 lần, hoặc 100 nước (ply) không ăn quân
+REPETITION_LIMIT = 3
+NO_CAPTURE_LIMIT = 100
+
+
+def _can_capture(attacker: Piece, attacker_level: int, defender: Piece, defender_level: int) -> bool:
+    # luật ăn quân ngoài bẫy; quân cùng màu không bao giờ ăn nhau
+    if attacker.color == defender.color:
+        return False
+    if attacker.type == PieceType.MOUSE and defender.type == PieceType.ELEPHANT:
+        return True
+    if attacker.type == PieceType.ELEPHANT and defender.type == PieceType.MOUSE:
+        return False
+    return attacker_level >= defender_level
+
+
+def _capture_table(levels: List[int]) -> List[int]:
+    """Bit `d` of row `a` is set when piece `a` may take piece `d` outside a trap."""
+    return [
+        sum(
+            1 << defender.index
+            for defender in PIECES
+            if _can_capture(attacker, levels[attacker.index], defender, levels[defender.index])
+        )
+        for attacker in PIECES
+    ]
+
+
+_DEFAULT_CAPTURES = _capture_table([piece.get_default_level().value for piece in PIECES])
 
 
 class Game:
     __state: State
+    # phần khoá Zobrist ứng với level_bonus của quân còn sống và upgrades_by_color
+    __level_hash: int
+    # người thắng: Color, None, hoặc _UNKNOWN khi chưa ai vào hang
+    # nhưng chưa kiểm tra bên tới lượt còn nước đi không
+    __winner: object
+    # bảng ăn quân theo level hiện tại, chỉ cập nhật khi level_bonus đổi
+    __captures: List[int]
+    # các nước đã đi (để undo) và số lần mỗi khoá Zobrist đã xuất hiện
+    __moves: List[MoveRecord]
+    __repetitions: Dict[int, int]
+    __no_capture_plies: int
 
-    def __init__(self):
+    def __init__(self, repetition_limit: int = REPETITION_LIMIT, no_capture_limit: int = NO_CAPTURE_LIMIT):
         self.__state = State()
         self.level_bonus: dict[Piece, int] = {
             p: 0 for p in self.__state.get_all_pieces()
@@ -17,96 +83,334 @@ class Game:
             Color.RED: 0,
             Color.BLUE: 0,
         }
+        self.__level_hash = 0
+        self.__winner = _UNKNOWN
+        self.__captures = _DEFAULT_CAPTURES[:]
+        # 0 = tắt luật hoà tương ứng
+        self.repetition_limit = repetition_limit
+        self.no_capture_limit = no_capture_limit
+        self.__moves = []
+        self.__repetitions = {self.get_hash(): 1}
+        self.__no_capture_plies = 0
+        # cache tuỳ chọn cho legal_moves, có thể dùng chung giữa nhiều ván
+        self.move_cache: Optional[MoveCache] = None
+
+    def clone(self) -> "Game":
+        """Independent copy sharing the Map and the interned pieces and positions."""
+        game = Game.__new__(Game)
+        game.__state = self.__state.clone()
+        game.level_bonus = self.level_bonus.copy()
+        game.upgrades_by_color = self.upgrades_by_color.copy()
+        game.__level_hash = self.__level_hash
+        game.__winner = self.__winner
+        game.__captures = self.__captures[:]
+        game.repetition_limit = self.repetition_limit
+        game.no_capture_limit = self.no_capture_limit
+        game.__moves = self.__moves[:]
+        game.__repetitions = self.__repetitions.copy()
+        game.__no_capture_plies = self.__no_capture_plies
+        game.move_cache = self.move_cache
+        return game
 
     def get_possible_moves(self, piece: Piece) -> List[Cell]:
-        pos = self.__state.get_piece_position(piece)
-        if pos is None:
+        square = self.__state.get_piece_square(piece.index)
+        if square < 0:
             return []
+        return self.__possible_cells(piece, square)
+
+    def __possible_cells(self, piece: Piece, square: int) -> List[Cell]:
+        state = self.__state
+        map = state.get_map()
+        width = map.width()
         adj_cells = (
-            self.__state.get_adjacent_cells(pos)
-            if piece.type not in [PieceType.TIGER, PieceType.LION]
-            else self.__state.get_adjacent_non_river_cells(pos)
+            map.get_adjacent_cells_at(square)
+            if piece.type != PieceType.TIGER and piece.type != PieceType.LION
+            else map.get_adjacent_non_river_cells_at(square)
         )
+        captures = self.__captures[piece.index]
+        # ở bẫy của mình thì ăn được mọi quân địch
+        enemies = 0xFF00 if piece.color == Color.RED else 0x00FF
+        trap_mask = map.get_trap_mask(piece.color)
 
-        standable_cells = []
-
+        cells = []
         for cell in adj_cells:
             adj_loc = cell.location
 
             if adj_loc.is_river:
-                if piece.type == PieceType.MOUSE:
-                    standable_cells.append(cell)
-            elif adj_loc.cave_color != piece.color:
-                standable_cells.append(cell)
+                if piece.type != PieceType.MOUSE:
+                    continue
+            elif adj_loc.cave_color == piece.color:
+                continue
 
-        not_blocked_by_other_pieces_cells = []
-        for cell in standable_cells:
-            adj_loc = cell.location
             adj_pos = cell.position
-            adj_piece = self.__state.get_piece_at_position(adj_pos)
+            adj_square = adj_pos.y * width + adj_pos.x
+            adj_index = state.get_piece_at_square(adj_square)
+            if adj_index < 0:
+                cells.append(cell)
+            elif trap_mask >> adj_square & 1:
+                if enemies >> adj_index & 1:
+                    cells.append(cell)
+            elif captures >> adj_index & 1:
+                cells.append(cell)
 
-            if adj_piece is None:
-                not_blocked_by_other_pieces_cells.append(cell)
-                continue
-            elif adj_piece.color == piece.color:
-                continue
-            elif cell.location.trap_color == piece.color:
-                not_blocked_by_other_pieces_cells.append(cell)
-                continue
-            elif piece.type == PieceType.MOUSE and adj_piece.type == PieceType.ELEPHANT:
-                not_blocked_by_other_pieces_cells.append(cell)
+        return cells
+
+    def legal_moves(self, color: Color) -> List[int]:
+        """All moves of `color` packed as `piece_index << 6 | square`."""
+        cache = self.move_cache
+        if cache is None:
+            return self.__generate_moves(color)
+
+        key = self.get_hash() << 1 | color.value
+        moves = cache.get(key)
+        if moves is None:
+            moves = tuple(self.__generate_moves(color))
+            cache.put(key, moves)
+        return list(moves)
+
+    def __generate_moves(self, color: Color) -> List[int]:
+        state = self.__state
+        width = state.get_map().width()
+        moves = []
+        start = 8 * color.value
+        for index in range(start, start + 8):
+            square = state.get_piece_square(index)
+            if square < 0:
                 continue
-            elif piece.type == PieceType.ELEPHANT and adj_piece.type == PieceType.MOUSE:
+            for cell in self.__possible_cells(PIECES[index], square):
+                pos = cell.position
+                moves.append(index << 6 | (pos.y * width + pos.x))
+        return moves
+
+    def iter_legal_moves(self, color: Color) -> Iterator[int]:
+        """Lazy variant of legal_moves, one piece at a time."""
+        state = self.__state
+        width = state.get_map().width()
+        start = 8 * color.value
+        for index in range(start, start + 8):
+            square = state.get_piece_square(index)
+            if square < 0:
                 continue
-            # elif piece.get_default_level() >= adj_piece.get_default_level():
-            #     not_blocked_by_other_pieces_cells.append(cell)
-            #     continue
-            elif self.get_current_level(piece) >= self.get_current_level(adj_piece):
-                not_blocked_by_other_pieces_cells.append(cell)
+            for cell in self.__possible_cells(PIECES[index], square):
+                pos = cell.position
+                yield index << 6 | (pos.y * width + pos.x)
+
+    def unpack_move(self, move: int) -> Tuple[Piece, Position]:
+        return PIECES[move >> 6], self.__state.get_map().get_cell(move & 63).position
 
-        return not_blocked_by_other_pieces_cells
+    def make_packed_move(self, move: int) -> MoveRecord:
+        return self.make_move(PIECES[move >> 6], self.__state.get_map().get_cell(move & 63).position)
 
     def move(self, piece: Piece, position: Position) -> Union[bool, Optional[Piece]]:
         if self.is_game_over():
             return False
 
-        possible_pos = list(map(lambda x: x.position, self.get_possible_moves(piece)))
-        if position not in possible_pos:
-            return False
+        if self.move_cache is not None:
+            if self.__state.get_location(position) is None:
+                return False
+            width = self.__state.get_map().width()
+            if piece.index << 6 | (position.y * width + position.x) not in self.legal_moves(piece.color):
+                return False
+        else:
+            possible_pos = list(map(lambda x: x.position, self.get_possible_moves(piece)))
+            if position not in possible_pos:
+                return False
+
+        record = self.make_move(piece, position)
+        if record.upgraded:
+            print(f"[UPGRADE] {piece.type.name} của {piece.color.name} lên cấp {self.get_current_level(piece)}")
+        return record.captured or True
+
+    def make_move(self, piece: Piece, position: Position) -> MoveRecord:
+        """Play a move without validating it and return its undo record."""
+        from_position = self.__state.get_piece_position_definitely(piece)
+        turn = self.__state.get_turn()
+        winner = self.__winner
+        upgraded = False
 
         replaced_piece = self.__state.get_piece_at_position(position)
-        # if replaced_piece is not None:
-        #     self.__state.kill_piece(replaced_piece)
         if replaced_piece is not None:
-            attacker = piece
-            defender = replaced_piece
+            attacker_level = self.get_current_level(piece)
+            defender_level = self.get_current_level(replaced_piece)
 
-            attacker_level = self.get_current_level(attacker)
-            defender_level = self.get_current_level(defender)
-
-            self.__state.kill_piece(defender)
+            self.__state.kill_piece(replaced_piece)
+            self.__level_hash ^= zobrist.LEVEL_BONUS[replaced_piece.index][self.level_bonus[replaced_piece]]
 
             # ✅ Nếu ăn hợp lệ và chưa nâng quá 3 lần → tăng cấp
             if attacker_level >= defender_level and self.upgrades_by_color[piece.color] < 3:
-                self.level_bonus[piece] += 1
-                self.upgrades_by_color[piece.color] += 1
-                print(f"[UPGRADE] {piece.type.name} của {piece.color.name} lên cấp {self.get_current_level(piece)}")
-        
+                self.__add_level_bonus(piece, 1)
+                self.__add_upgrade(piece.color, 1)
+                upgraded = True
+
         self.__state.set_piece_position(piece, position)
         self.__state.next_turn()
-        return replaced_piece or True
+        if not isinstance(winner, Color):
+            if self.__state.get_location_definitely(position).cave_color is not None:
+                self.__winner = piece.color
+            else:
+                self.__winner = _UNKNOWN
 
-    def is_game_over(self) -> Optional[Color]:
-        for piece in self.__state.get_all_pieces():
-            pos = self.__state.get_piece_position(piece)
-            if pos is None:
-                continue
-            loc = self.__state.get_location_definitely(pos)
-            if loc.cave_color is None:
-                continue
-            return loc.cave_color
+        record = MoveRecord(
+            piece, from_position, position, replaced_piece, upgraded, turn, winner, self.__no_capture_plies
+        )
+        self.__moves.append(record)
+        self.__no_capture_plies = 0 if replaced_piece is not None else self.__no_capture_plies + 1
+        key = self.get_hash()
+        self.__repetitions[key] = self.__repetitions.get(key, 0) + 1
+        return record
+
+    def unmake_move(self, record: MoveRecord):
+        """Undo the move that produced `record`; records must be undone in LIFO order."""
+        key = self.get_hash()
+        count = self.__repetitions[key] - 1
+        if count:
+            self.__repetitions[key] = count
+        else:
+            del self.__repetitions[key]
+        self.__moves.pop()
+        self.__no_capture_plies = record.no_capture_plies
+
+        self.__state.set_piece_position(record.piece, record.from_position)
+        if record.captured is not None:
+            self.__state.set_piece_position(record.captured, record.to_position)
+            self.__level_hash ^= zobrist.LEVEL_BONUS[record.captured.index][self.level_bonus[record.captured]]
+        if record.upgraded:
+            self.__add_level_bonus(record.piece, -1)
+            self.__add_upgrade(record.piece.color, -1)
+        self.__state.set_turn(record.turn)
+        self.__winner = record.winner
+
+    def undo(self) -> Optional[MoveRecord]:
+        """Take back the last move, if any, and return its record."""
+        if not self.__moves:
+            return None
+        record = self.__moves[-1]
+        self.unmake_move(record)
+        return record
+
+    def get_move_history(self) -> List[int]:
+        """Moves played so far, packed as `piece_index << 6 | square`."""
+        width = self.__state.get_map().width()
+        return [
+            record.piece.index << 6 | (record.to_position.y * width + record.to_position.x)
+            for record in self.__moves
+        ]
+
+    def get_no_capture_plies(self) -> int:
+        return self.__no_capture_plies
+
+    def get_repetition_count(self) -> int:
+        """How many times the current position has occurred, including now."""
+        return self.__repetitions.get(self.get_hash(), 0)
+
+    def is_draw(self) -> bool:
+        """True when the game is not won but a draw rule (repetition or no capture) applies."""
+        return self.get_draw_reason() is not None
+
+    def get_draw_reason(self) -> Optional[str]:
+        """"no captures" or "repetition" when the game is drawn, else None."""
+        if self.is_game_over() is not None:
+            return None
+        if self.no_capture_limit and self.__no_capture_plies >= self.no_capture_limit:
+            return "no captures"
+        if self.repetition_limit and self.get_repetition_count() >= self.repetition_limit:
+            return "repetition"
         return None
 
+    def is_game_over(self) -> Optional[Color]:
+        """Color that entered the enemy den, or whose opponent has no move left."""
+        if self.__winner is _UNKNOWN:
+            self.__winner = self.__find_winner(False)
+        return self.__winner  # type: ignore
+
+    def __find_winner(self, check_dens: bool) -> Optional[Color]:
+        state = self.__state
+        if check_dens:
+            for index, piece in enumerate(PIECES):
+                square = state.get_piece_square(index)
+                if square < 0:
+                    continue
+                if state.get_location_definitely(state.get_piece_position_definitely(piece)).cave_color is not None:
+                    return piece.color
+
+        turn = state.get_turn()
+        if next(self.iter_legal_moves(turn), None) is not None:
+            return None
+        return Color.BLUE if turn == Color.RED else Color.RED
+
+    def __add_level_bonus(self, piece: Piece, delta: int):
+        bonus = self.level_bonus[piece]
+        # level của quân đã bị ăn không thuộc khoá
+        if self.__state.get_piece_square(piece.index) >= 0:
+            table = zobrist.LEVEL_BONUS[piece.index]
+            self.__level_hash ^= table[bonus] ^ table[bonus + delta]
+        self.level_bonus[piece] = bonus + delta
+        self.__update_captures(piece)
+
+    def __add_upgrade(self, color: Color, delta: int):
+        table = zobrist.UPGRADES[color.value]
+        count = self.upgrades_by_color[color]
+        self.__level_hash ^= table[count] ^ table[count + delta]
+        self.upgrades_by_color[color] = count + delta
+
+    def __update_captures(self, piece: Piece):
+        # chỉ hàng của quân này và cột của nó ở các hàng quân địch thay đổi
+        captures = self.__captures
+        level = self.get_current_level(piece)
+        bit = 1 << piece.index
+        row = 0
+        start = 8 - 8 * piece.color.value
+        for index in range(start, start + 8):
+            enemy = PIECES[index]
+            enemy_level = self.get_current_level(enemy)
+            if _can_capture(piece, level, enemy, enemy_level):
+                row |= 1 << index
+            if _can_capture(enemy, enemy_level, piece, level):
+                captures[index] |= bit
+            else:
+                captures[index] &= ~bit
+        captures[piece.index] = row
+
+    def to_bytes(self) -> bytes:
+        state = self.__state
+        data = bytearray(ENCODED_SIZE)
+        for index, piece in enumerate(PIECES):
+            square = state.get_piece_square(index)
+            data[index] = square if square >= 0 else CAPTURED_SQUARE
+            data[16 + index] = self.level_bonus[piece]
+        data[32] = self.upgrades_by_color[Color.RED]
+        data[33] = self.upgrades_by_color[Color.BLUE]
+        data[34] = state.get_turn().value
+        return bytes(data)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "Game":
+        if len(data) != ENCODED_SIZE:
+            raise ValueError(f"Expected {ENCODED_SIZE} bytes, got {len(data)}")
+        squares = [-1 if square == CAPTURED_SQUARE else square for square in data[:16]]
+        occupied = [square for square in squares if square >= 0]
+        if any(square >= 63 for square in occupied) or len(set(occupied)) != len(occupied):
+            raise ValueError("Invalid piece squares")
+        if any(bonus > zobrist.MAX_LEVEL_BONUS for bonus in data[16:32]):
+            raise ValueError("Invalid level bonus")
+        if data[32] > zobrist.MAX_UPGRADES or data[33] > zobrist.MAX_UPGRADES or data[34] > 1:
+            raise ValueError("Invalid upgrade counters or turn")
+
+        game = Game()
+        game.__state.load_piece_squares(squares, Color(data[34]))
+        for index, piece in enumerate(PIECES):
+            if data[16 + index]:
+                game.__add_level_bonus(piece, data[16 + index])
+        game.__add_upgrade(Color.RED, data[32])
+        game.__add_upgrade(Color.BLUE, data[33])
+        game.__winner = game.__find_winner(True)
+        game.__repetitions = {game.get_hash(): 1}
+        return game
+
+    def get_hash(self) -> int:
+        """64-bit Zobrist key of pieces, levels of live pieces, upgrade counters and side to move."""
+        return self.__state.get_hash() ^ self.__level_hash
+
     def get_state(self) -> State:
         return self.__state
 
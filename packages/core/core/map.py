@@ -1,19 +1,97 @@
-from typing import List, Optional, Tuple
-from marshmallow_dataclass import dataclass
+from dataclasses import FrozenInstanceError
+from typing import List, NamedTuple, Optional, Tuple
 from core.piece import Color
+from core.schema import LazySchema
 
 
-@dataclass(frozen=True)
 class Location:
+    __slots__ = ("is_river", "cave_color", "trap_color")
     is_river: bool
     cave_color: Optional[Color]
     trap_color: Optional[Color]
+    Schema = LazySchema()
+
+    def __init__(self, is_river: bool, cave_color: Optional[Color], trap_color: Optional[Color]):
+        object.__setattr__(self, "is_river", is_river)
+        object.__setattr__(self, "cave_color", cave_color)
+        object.__setattr__(self, "trap_color", trap_color)
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if other.__class__ is not Location:
+            return NotImplemented
+        return (
+            self.is_river == other.is_river
+            and self.cave_color == other.cave_color
+            and self.trap_color == other.trap_color
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.is_river, self.cave_color, self.trap_color))
+
+    def __reduce__(self):
+        return (Location, (self.is_river, self.cave_color, self.trap_color))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return f"Location(is_river={self.is_river!r}, cave_color={self.cave_color!r}, trap_color={self.trap_color!r})"
 
 
-@dataclass(frozen=True)
 class Position:
+    """A board coordinate.
+
+    Positions on the 7x9 board are interned, so Position(x, y) returns a
+    shared instance; off-board positions are plain values.
+    """
+
+    __slots__ = ("x", "y", "_hash")
     x: int
     y: int
+    Schema = LazySchema()
+
+    def __new__(cls, x: int, y: int) -> "Position":
+        if 0 <= x < BOARD_WIDTH and 0 <= y < BOARD_HEIGHT:
+            return POSITIONS[y * BOARD_WIDTH + x]
+        return _make_position(x, y)
+
+    @staticmethod
+    def from_square(square: int) -> "Position":
+        """Interned position of square `y * 7 + x`."""
+        return POSITIONS[square]
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if other.__class__ is not Position:
+            return NotImplemented
+        return self.x == other.x and self.y == other.y
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        return (Position, (self.x, self.y))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return f"Position(x={self.x!r}, y={self.y!r})"
 
     def is_left(self, position) -> bool:
         return self.x == position.x - 1 and self.y == position.y
@@ -28,15 +106,92 @@ class Position:
         return self.y == position.y + 1 and self.x == position.x
 
 
-@dataclass(frozen=True)
+def _make_position(x: int, y: int) -> Position:
+    pos = object.__new__(Position)
+    object.__setattr__(pos, "x", x)
+    object.__setattr__(pos, "y", y)
+    object.__setattr__(pos, "_hash", hash((x, y)))
+    return pos
+
+
+BOARD_WIDTH = 7
+BOARD_HEIGHT = 9
+POSITIONS: Tuple[Position, ...] = tuple(
+    _make_position(square % BOARD_WIDTH, square // BOARD_WIDTH)
+    for square in range(BOARD_WIDTH * BOARD_HEIGHT)
+)
+
+
 class Cell:
+    __slots__ = ("location", "position")
     location: Location
     position: Position
+    Schema = LazySchema()
+
+    def __init__(self, location: Location, position: Position):
+        object.__setattr__(self, "location", location)
+        object.__setattr__(self, "position", position)
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if other.__class__ is not Cell:
+            return NotImplemented
+        return self.location == other.location and self.position == other.position
+
+    def __hash__(self) -> int:
+        return hash((self.location, self.position))
+
+    def __reduce__(self):
+        return (Cell, (self.location, self.position))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return f"Cell(location={self.location!r}, position={self.position!r})"
 
 
-@dataclass(frozen=True)
 class Map:
+    """Board layout; treated as immutable, so copies share it."""
+
+    __slots__ = ("locations", "_cell_tables")
     locations: List[List[Location]]
+    Schema = LazySchema()
+
+    def __init__(self, locations: List[List[Location]]):
+        object.__setattr__(self, "locations", locations)
+        object.__setattr__(self, "_cell_tables", None)
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if other.__class__ is not Map:
+            return NotImplemented
+        return self.locations == other.locations
+
+    __hash__ = None  # type: ignore
+
+    def __reduce__(self):
+        return (Map, (self.locations,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return f"Map(locations={self.locations!r})"
 
     def width(self) -> int:
         return len(self.locations[0])
@@ -51,101 +206,124 @@ class Map:
             return None
         return self.locations[indices[0]][indices[1]]
 
-    def get_adjacent_cells(self, pos: Position) -> List[Cell]:
-        res = []
-        left = self.get_left_cell(pos)
-        if left:
-            res.append(left)
-        right = self.get_right_cell(pos)
-        if right:
-            res.append(right)
-        up = self.get_up_cell(pos)
-        if up:
-            res.append(up)
-        down = self.get_down_cell(pos)
-        if down:
-            res.append(down)
-        return res
-
-    def get_adjacent_non_river_cells(self, pos: Position) -> List[Cell]:
-        res = []
-        left = self.get_non_river_down_cell(pos)
-        if left:
-            res.append(left)
-        right = self.get_non_river_right_cell(pos)
-        if right:
-            res.append(right)
-        up = self.get_non_river_up_cell(pos)
-        if up:
-            res.append(up)
-        down = self.get_non_river_down_cell(pos)
-        if down:
-            res.append(down)
-        return res
+    def get_adjacent_cells(self, pos: Position) -> Tuple[Cell, ...]:
+        if not self.__contains(pos):
+            return tuple(cell for cell in self.__walk_all(pos, False) if cell)
+        return self.__tables().adjacent[pos.y * self.width() + pos.x]
+
+    def get_adjacent_non_river_cells(self, pos: Position) -> Tuple[Cell, ...]:
+        if not self.__contains(pos):
+            return tuple(cell for cell in self.__walk_all(pos, True) if cell)
+        return self.__tables().adjacent_non_river[pos.y * self.width() + pos.x]
+
+    def get_cell(self, square: int) -> Cell:
+        """Cell of square `y * width + x`."""
+        return self.__tables().cells[square]
+
+    def get_adjacent_cells_at(self, square: int) -> Tuple[Cell, ...]:
+        return self.__tables().adjacent[square]
+
+    def get_adjacent_non_river_cells_at(self, square: int) -> Tuple[Cell, ...]:
+        return self.__tables().adjacent_non_river[square]
+
+    def get_trap_mask(self, color: Color) -> int:
+        """Bitmask of the squares holding a trap of `color`."""
+        return self.__tables().traps[color.value]
 
     def get_left_cell(self, pos: Position) -> Optional[Cell]:
-        loc = self[pos.y, pos.x - 1]
-        if loc is None:
-            return None
-        return Cell(loc, Position(pos.x - 1, pos.y))
+        return self.__lookup(pos, 0, 0)
 
     def get_right_cell(self, pos: Position) -> Optional[Cell]:
-        loc = self[pos.y, pos.x + 1]
-        if loc is None:
-            return None
-        return Cell(loc, Position(pos.x + 1, pos.y))
+        return self.__lookup(pos, 0, 1)
 
     def get_up_cell(self, pos: Position) -> Optional[Cell]:
-        loc = self[pos.y - 1, pos.x]
-        if loc is None:
-            return None
-        return Cell(loc, Position(pos.x, pos.y - 1))
+        return self.__lookup(pos, 0, 2)
 
     def get_down_cell(self, pos: Position) -> Optional[Cell]:
-        loc = self[pos.y + 1, pos.x]
-        if loc is None:
-            return None
-        return Cell(loc, Position(pos.x, pos.y + 1))
+        return self.__lookup(pos, 0, 3)
 
     def get_non_river_left_cell(self, pos: Position) -> Optional[Cell]:
-        pos = Position(pos.x - 1, pos.y)
-        loc = self[pos.y, pos.x]
-        while loc is not None and loc.is_river:
-            pos = Position(pos.x - 1, pos.y)
-            loc = self[pos.y, pos.x]
-        if loc is None:
-            return None
-        return Cell(loc, pos)
+        return self.__lookup(pos, 1, 0)
 
     def get_non_river_right_cell(self, pos: Position) -> Optional[Cell]:
-        pos = Position(pos.x + 1, pos.y)
-        loc = self[pos.y, pos.x]
-        while loc is not None and loc.is_river:
-            pos = Position(pos.x + 1, pos.y)
-            loc = self[pos.y, pos.x]
-        if loc is None:
-            return None
-        return Cell(loc, pos)
+        return self.__lookup(pos, 1, 1)
 
     def get_non_river_up_cell(self, pos: Position) -> Optional[Cell]:
-        pos = Position(pos.x, pos.y - 1)
-        loc = self[pos.y, pos.x]
-        while loc is not None and loc.is_river:
-            pos = Position(pos.x, pos.y - 1)
-            loc = self[pos.y, pos.x]
-        if loc is None:
-            return None
-        return Cell(loc, pos)
+        return self.__lookup(pos, 1, 2)
 
     def get_non_river_down_cell(self, pos: Position) -> Optional[Cell]:
-        pos = Position(pos.x, pos.y + 1)
-        loc = self[pos.y, pos.x]
-        while loc is not None and loc.is_river:
-            pos = Position(pos.x, pos.y + 1)
-            loc = self[pos.y, pos.x]
+        return self.__lookup(pos, 1, 3)
+
+    def __contains(self, pos: Position) -> bool:
+        return 0 <= pos.x < self.width() and 0 <= pos.y < self.height()
+
+    def __lookup(self, pos: Position, table: int, direction: int) -> Optional[Cell]:
+        if not self.__contains(pos):
+            return self.__walk_all(pos, table == 1)[direction]
+        tables = self.__tables()
+        cells = tables.jumps if table == 1 else tables.steps
+        return cells[pos.y * self.width() + pos.x][direction]
+
+    def __walk(self, pos: Position, dx: int, dy: int, jump_river: bool) -> Optional[Cell]:
+        x, y = pos.x + dx, pos.y + dy
+        loc = self[y, x]
+        while jump_river and loc is not None and loc.is_river:
+            x, y = x + dx, y + dy
+            loc = self[y, x]
         if loc is None:
             return None
-        return Cell(loc, pos)
+        return Cell(loc, Position(x, y))
+
+    def __walk_all(self, pos: Position, jump_river: bool) -> Tuple[Optional[Cell], ...]:
+        # thứ tự: trái, phải, lên, xuống
+        return (
+            self.__walk(pos, -1, 0, jump_river),
+            self.__walk(pos, 1, 0, jump_river),
+            self.__walk(pos, 0, -1, jump_river),
+            self.__walk(pos, 0, 1, jump_river),
+        )
+
+    def __tables(self) -> "_CellTables":
+        # Bảng ô kề theo từng ô, chỉ tính một lần cho mỗi Map.
+        # Map là frozen nên phải gán qua object.__setattr__.
+        tables = self._cell_tables
+        if tables is not None:
+            return tables
+
+        steps = []
+        jumps = []
+        cells = []
+        traps = [0, 0]
+        for y in range(self.height()):
+            for x in range(self.width()):
+                steps.append(self.__walk_all(Position(x, y), False))
+                jumps.append(self.__walk_all(Position(x, y), True))
+                cells.append(Cell(self.locations[y][x], Position(x, y)))
+                trap_color = self.locations[y][x].trap_color
+                if trap_color is not None:
+                    traps[trap_color.value] |= 1 << (y * self.width() + x)
+        tables = _CellTables(
+            tuple(steps),
+            tuple(jumps),
+            tuple(tuple(cell for cell in cells if cell) for cells in steps),
+            tuple(tuple(cell for cell in cells if cell) for cells in jumps),
+            tuple(cells),
+            (traps[0], traps[1]),
+        )
+        object.__setattr__(self, "_cell_tables", tables)
+        return tables
+
+
+class _CellTables(NamedTuple):
+    # ô kề theo thứ tự trái, phải, lên, xuống (None nếu ra ngoài bàn)
+    steps: Tuple[Tuple[Optional[Cell], ...], ...]
+    # như steps nhưng sư tử / hổ nhảy qua sông
+    jumps: Tuple[Tuple[Optional[Cell], ...], ...]
+    adjacent: Tuple[Tuple[Cell, ...], ...]
+    adjacent_non_river: Tuple[Tuple[Cell, ...], ...]
+    cells: Tuple[Cell, ...]
+    # bitmask ô bẫy của mỗi màu
+    traps: Tuple[int, int]
 
 
 DEFAULT_MAP = Map(
@@ -0,0 +1,62 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class MoveCache:
+    """Bounded LRU cache of legal move lists, keyed by the full position key.
+
+    Attach one to `Game.move_cache` and `Game.legal_moves` reads through it.
+    A cache may be shared by several games on the same Map.
+    """
+
+    max_size: int
+    hits: int
+    misses: int
+    __entries: "OrderedDict[int, Tuple[int, ...]]"
+
+    def __init__(self, max_size: int = 1 << 16):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+
+    def get(self, key: int) -> Optional[Tuple[int, ...]]:
+        moves = self.__entries.get(key)
+        if moves is None:
+            self.misses += 1
+            return None
+        self.__entries.move_to_end(key)
+        self.hits += 1
+        return moves
+
+    def put(self, key: int, moves: Tuple[int, ...]):
+        entries = self.__entries
+        entries[key] = moves
+        entries.move_to_end(key)
+        if len(entries) > self.max_size:
+            # bỏ mục lâu nhất chưa dùng tới
+            entries.popitem(last=False)
+
+    def clear(self):
+        self.__entries.clear()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the hit and miss counters, keeping the entries."""
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __repr__(self) -> str:
+        return (
+            f"MoveCache({len(self)}/{self.max_size} entries, "
+            f"{self.hits} hits, {self.misses} misses, {self.hit_rate():.1%} hit rate)"
+        )
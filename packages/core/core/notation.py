@@ -0,0 +1,130 @@
+"""One-line text notation for a Game, in the spirit of chess FEN.
+
+    <rows> <side> <upgrades>
+
+rows: the 9 board rows from y = 0 (red den) to y = 8, separated by "/".
+Each row lists its 7 squares from x = 0: a digit counts empty squares, a
+letter is a piece (uppercase red, lowercase blue) followed by one "+"
+per level bonus.
+side: "r" or "b", the side to move.
+upgrades: the upgrade counters of red and blue, e.g. "1-0".
+
+The start position is
+
+    L5T/1D3C1/M1P1W1E/7/7/7/e1w1p1m/1c3d1/t5l r 0-0
+
+Level bonuses of captured pieces are not kept, and neither are move
+history or draw counters; none of them is part of the Zobrist key, so a
+round trip through the notation keeps `Game.get_hash()`.
+"""
+from typing import Dict
+
+from core.game import CAPTURED_SQUARE, ENCODED_SIZE, Game
+from core.map import BOARD_HEIGHT, BOARD_WIDTH
+from core.piece import PIECES, Color, PieceType
+from core.zobrist import MAX_LEVEL_BONUS
+
+LETTERS: Dict[PieceType, str] = {
+    PieceType.MOUSE: "m",
+    PieceType.CAT: "c",
+    PieceType.WOLF: "w",
+    PieceType.DOG: "d",
+    PieceType.LEOPARD: "p",
+    PieceType.TIGER: "t",
+    PieceType.LION: "l",
+    PieceType.ELEPHANT: "e",
+}
+
+# ký tự -> chỉ số quân
+_PIECE_OF_LETTER: Dict[str, int] = {}
+for _piece in PIECES:
+    _letter = LETTERS[_piece.type]
+    _PIECE_OF_LETTER[_letter.upper() if _piece.color == Color.RED else _letter] = _piece.index
+
+START = "L5T/1D3C1/M1P1W1E/7/7/7/e1w1p1m/1c3d1/t5l r 0-0"
+
+
+def to_notation(game: Game) -> str:
+    state = game.get_state()
+    if state.get_map().width() != BOARD_WIDTH or state.get_map().height() != BOARD_HEIGHT:
+        raise ValueError("Notation only supports 7x9 maps")
+
+    rows = []
+    for y in range(BOARD_HEIGHT):
+        row = []
+        empty = 0
+        for x in range(BOARD_WIDTH):
+            index = state.get_piece_at_square(y * BOARD_WIDTH + x)
+            if index < 0:
+                empty += 1
+                continue
+            if empty:
+                row.append(str(empty))
+                empty = 0
+            piece = PIECES[index]
+            letter = LETTERS[piece.type]
+            row.append(letter.upper() if piece.color == Color.RED else letter)
+            row.append("+" * game.level_bonus[piece])
+        if empty:
+            row.append(str(empty))
+        rows.append("".join(row))
+
+    side = "r" if game.get_turn() == Color.RED else "b"
+    upgrades = f"{game.upgrades_by_color[Color.RED]}-{game.upgrades_by_color[Color.BLUE]}"
+    return f"{'/'.join(rows)} {side} {upgrades}"
+
+
+def from_notation(text: str) -> Game:
+    """Parse `text`; raises ValueError when it is not a valid position."""
+    fields = text.split()
+    if len(fields) != 3:
+        raise ValueError("Expected placement, side to move and upgrades")
+    placement, side, upgrades = fields
+
+    data = bytearray(ENCODED_SIZE)
+    data[:16] = bytes([CAPTURED_SQUARE]) * 16
+
+    rows = placement.split("/")
+    if len(rows) != BOARD_HEIGHT:
+        raise ValueError(f"Expected {BOARD_HEIGHT} rows, got {len(rows)}")
+    for y, row in enumerate(rows):
+        x = 0
+        i = 0
+        while i < len(row):
+            char = row[i]
+            i += 1
+            if char.isdigit():
+                if char == "0":
+                    raise ValueError(f"Empty run of 0 squares in row {y}")
+                x += int(char)
+                continue
+            index = _PIECE_OF_LETTER.get(char)
+            if index is None:
+                raise ValueError(f"Unknown piece {char!r}")
+            if data[index] != CAPTURED_SQUARE:
+                raise ValueError(f"Piece {char!r} appears twice")
+            if x >= BOARD_WIDTH:
+                raise ValueError(f"Row {y} is longer than {BOARD_WIDTH} squares")
+            bonus = 0
+            while i < len(row) and row[i] == "+":
+                bonus += 1
+                i += 1
+            if bonus > MAX_LEVEL_BONUS:
+                raise ValueError(f"Level bonus of {char!r} is above {MAX_LEVEL_BONUS}")
+            data[index] = y * BOARD_WIDTH + x
+            data[16 + index] = bonus
+            x += 1
+        if x != BOARD_WIDTH:
+            raise ValueError(f"Row {y} has {x} squares, expected {BOARD_WIDTH}")
+
+    if side not in ("r", "b"):
+        raise ValueError(f"Unknown side to move {side!r}")
+    data[34] = Color.RED.value if side == "r" else Color.BLUE.value
+
+    red, _, blue = upgrades.partition("-")
+    if not (red.isdigit() and blue.isdigit()) or int(red) > 3 or int(blue) > 3:
+        raise ValueError(f"Invalid upgrade counters {upgrades!r}")
+    data[32] = int(red)
+    data[33] = int(blue)
+
+    return Game.from_bytes(bytes(data))
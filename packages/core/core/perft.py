@@ -0,0 +1,122 @@
+"""Perft: count the leaf nodes of the move tree, split by move type.
+
+Run `python -m core.perft` to check move generation against the stored
+reference counts and report nodes per second, or `--update` to rewrite
+them after an intended rule change.
+"""
+import argparse
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+from core.game import Game
+from core.notation import from_notation
+from core.piece import PieceType
+
+REFERENCE_PATH = os.path.join(os.path.dirname(__file__), "perft_reference.json")
+
+
+@dataclass
+class PerftCounts:
+    nodes: int = 0
+    quiet: int = 0
+    captures: int = 0
+    trap_captures: int = 0
+    river_jumps: int = 0
+    upgrades: int = 0
+    den_entries: int = 0
+
+
+def perft(game: Game, depth: int) -> PerftCounts:
+    """Count the positions `depth` plies below `game`; finished games are not expanded."""
+    counts = PerftCounts()
+    if depth == 0:
+        counts.nodes = 1
+    else:
+        _perft(game, depth, counts)
+    return counts
+
+
+def _perft(game: Game, depth: int, counts: PerftCounts):
+    if game.is_game_over() is not None:
+        return
+
+    for move in game.legal_moves(game.get_turn()):
+        record = game.make_packed_move(move)
+        if depth > 1:
+            _perft(game, depth - 1, counts)
+        else:
+            _count_move(game, record, counts)
+        game.unmake_move(record)
+
+
+def _count_move(game: Game, record, counts: PerftCounts):
+    counts.nodes += 1
+    piece = record.piece
+    from_pos, to_pos = record.from_position, record.to_position
+    location = game.get_state().get_location_definitely(to_pos)
+
+    if record.captured is None:
+        counts.quiet += 1
+    else:
+        counts.captures += 1
+        if location.trap_color == piece.color:
+            counts.trap_captures += 1
+    if (piece.type == PieceType.LION or piece.type == PieceType.TIGER) and (
+        abs(from_pos.x - to_pos.x) + abs(from_pos.y - to_pos.y) > 1
+    ):
+        counts.river_jumps += 1
+    if record.upgraded:
+        counts.upgrades += 1
+    if location.cave_color is not None:
+        counts.den_entries += 1
+
+
+def load_reference(path: str = REFERENCE_PATH) -> List[Dict]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_reference(entries: List[Dict], update: bool = False) -> bool:
+    """Run every reference entry, print its speed and return whether all counts matched."""
+    ok = True
+    total_nodes = 0
+    total_time = 0.0
+    for entry in entries:
+        game = from_notation(entry["position"])
+        start = time.perf_counter()
+        counts = asdict(perft(game, entry["depth"]))
+        elapsed = time.perf_counter() - start
+        total_nodes += counts["nodes"]
+        total_time += elapsed
+
+        status = "ok"
+        if update:
+            entry["counts"] = counts
+        elif counts != entry["counts"]:
+            ok = False
+            status = f"MISMATCH expected {entry['counts']}"
+        print(
+            f"{entry['name']:<12} depth {entry['depth']}: {counts['nodes']:>8} nodes "
+            f"{counts['nodes'] / elapsed:>10.0f} nodes/s  {status}"
+        )
+
+    print(f"total: {total_nodes} nodes in {total_time:.2f}s ({total_nodes / total_time:.0f} nodes/s)")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perft move-generation check and benchmark")
+    parser.add_argument("--update", action="store_true", help="rewrite the reference counts")
+    args = parser.parse_args()
+
+    entries = load_reference()
+    ok = run_reference(entries, args.update)
+    if args.update:
+        with open(REFERENCE_PATH, "w") as f:
+            json.dump(entries, f, indent=2)
+            f.write("\n")
+    elif not ok:
+        raise SystemExit(1)
@@ -1,5 +1,7 @@
-from marshmallow_dataclass import dataclass
+from dataclasses import FrozenInstanceError
 from enum import Enum
+from typing import Tuple
+from core.schema import LazySchema
 
 
 class PieceType(Enum):
@@ -59,10 +61,41 @@ class Color(Enum):
         return "red" if self == Color.RED else "blue"
 
 
-@dataclass(frozen=True)
 class Piece:
+    """One of the 16 pieces of the game.
+
+    Pieces are interned: Piece(color, type) always returns the same
+    instance, so equality and hashing are identity-based.
+    """
+
+    __slots__ = ("color", "type", "index")
     color: Color
-    type: PieceType    
+    type: PieceType
+    # chỉ số theo thứ tự State.get_all_pieces(): đỏ 0-7, xanh 8-15, voi trước
+    index: int
+    Schema = LazySchema()
+
+    def __new__(cls, color: Color, type: PieceType) -> "Piece":
+        return PIECES[color.value * 8 + PieceType.ELEPHANT.value - type.value]
+
+    @staticmethod
+    def from_index(index: int) -> "Piece":
+        return PIECES[index]
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __reduce__(self):
+        return (Piece, (self.color, self.type))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return f"Piece(color={self.color!r}, type={self.type!r})"
 
     def can_cross_river(self) -> bool:
         return self.type == PieceType.MOUSE
@@ -72,3 +105,19 @@ class Piece:
 
     def get_default_level(self) -> int:
         return self.type
+
+
+def _make_piece(color: Color, type: PieceType, index: int) -> Piece:
+    piece = object.__new__(Piece)
+    object.__setattr__(piece, "color", color)
+    object.__setattr__(piece, "type", type)
+    object.__setattr__(piece, "index", index)
+    return piece
+
+
+PIECES: Tuple[Piece, ...] = tuple(
+    _make_piece(color, PieceType(PieceType.ELEPHANT.value - i), color.value * 8 + i)
+    for color in (Color.RED, Color.BLUE)
+    for i in range(8)
+)
+
@@ -0,0 +1,74 @@
+from typing import Dict
+
+# Schema marshmallow cho các kiểu giá trị của core (định dạng gửi qua mạng).
+# marshmallow chỉ được import khi có người dùng tới `X.Schema` lần đầu, nên
+# import core (server, tiến trình AI, client) không phải trả chi phí này.
+
+_schemas: Dict[str, type] = {}
+
+
+def get_schema(name: str) -> type:
+    if not _schemas:
+        _build_schemas()
+    return _schemas[name]
+
+
+class LazySchema:
+    """Class attribute resolving to the marshmallow schema of its owner class."""
+
+    def __get__(self, instance, owner) -> type:
+        return get_schema(owner.__name__)
+
+
+def _build_schemas():
+    from marshmallow import Schema, fields, post_load
+    from core.map import Cell, Location, Map, Position
+    from core.piece import Color, Piece, PieceType
+
+    class PieceSchema(Schema):
+        color = fields.Enum(Color, required=True)
+        type = fields.Enum(PieceType, required=True)
+
+        @post_load
+        def make_piece(self, data, **kwargs) -> Piece:
+            return Piece(data["color"], data["type"])
+
+    class PositionSchema(Schema):
+        x = fields.Int(required=True)
+        y = fields.Int(required=True)
+
+        @post_load
+        def make_position(self, data, **kwargs) -> Position:
+            return Position(data["x"], data["y"])
+
+    class LocationSchema(Schema):
+        is_river = fields.Bool(required=True)
+        cave_color = fields.Enum(Color, allow_none=True, load_default=None)
+        trap_color = fields.Enum(Color, allow_none=True, load_default=None)
+
+        @post_load
+        def make_location(self, data, **kwargs) -> Location:
+            return Location(data["is_river"], data["cave_color"], data["trap_color"])
+
+    class CellSchema(Schema):
+        location = fields.Nested(LocationSchema, required=True)
+        position = fields.Nested(PositionSchema, required=True)
+
+        @post_load
+        def make_cell(self, data, **kwargs) -> Cell:
+            return Cell(data["location"], data["position"])
+
+    class MapSchema(Schema):
+        locations = fields.List(fields.List(fields.Nested(LocationSchema)), required=True)
+
+        @post_load
+        def make_map(self, data, **kwargs) -> Map:
+            return Map(data["locations"])
+
+    _schemas.update(
+        Piece=PieceSchema,
+        Position=PositionSchema,
+        Location=LocationSchema,
+        Cell=CellSchema,
+        Map=MapSchema,
+    )
@@ -1,12 +1,56 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from core.map import Cell, Location, Position, DEFAULT_MAP, Map
-from core.piece import Color, Piece, PieceType
+from core.piece import PIECES, Color, Piece, PieceType
+from core import zobrist
+
+
+class _DistanceTables:
+    """Per-square distances used by the evaluation accumulators."""
+
+    # den[color][square]: số hàng tới hang đối phương của quân màu color
+    den: Tuple[Tuple[int, ...], Tuple[int, ...]]
+    # centre[square]: khoảng cách Manhattan tới ô giữa bàn cờ
+    centre: Tuple[int, ...]
+
+    def __init__(self, map: Map):
+        width, height = map.width(), map.height()
+        den_rows = [0, 0]
+        for y in range(height):
+            for x in range(width):
+                cave_color = map.locations[y][x].cave_color
+                if cave_color is not None:
+                    den_rows[cave_color.value] = y
+
+        centre_x, centre_y = width // 2, height // 2
+        squares = range(width * height)
+        self.den = (
+            tuple(abs(square // width - den_rows[Color.BLUE.value]) for square in squares),
+            tuple(abs(square // width - den_rows[Color.RED.value]) for square in squares),
+        )
+        self.centre = tuple(abs(square % width - centre_x) + abs(square // width - centre_y) for square in squares)
+
+
+_DEFAULT_DISTANCES = _DistanceTables(DEFAULT_MAP)
+
+# giá trị vật chất của quân: level mặc định + 1 (chuột 1 ... voi 8)
+MATERIAL = tuple(piece.get_default_level().value + 1 for piece in PIECES)
 
 
 class State:
     __map: Map
     __piece_positions: Dict[Piece, Optional[Position]]
+    # mailbox: ô -> chỉ số quân (-1 nếu trống), và chỉ số quân -> ô (-1 nếu đã chết)
+    __board: List[int]
+    __piece_squares: List[int]
     __turn: Color
+    # khoá Zobrist của vị trí quân và lượt đi, cập nhật dần
+    __hash: int
+    # tổng theo màu (chỉ số Color.value), cập nhật O(1) mỗi khi quân di chuyển hoặc chết
+    __distances: _DistanceTables
+    __piece_counts: List[int]
+    __material: List[int]
+    __den_distance: List[int]
+    __centre_distance: List[int]
 
     def __init__(self, map=DEFAULT_MAP, turn=Color.RED):
         self.__map = map
@@ -30,26 +74,40 @@ class State:
         }
         self.__turn = turn
 
+        width = map.width()
+        self.__board = [-1] * (width * map.height())
+        self.__piece_squares = [-1] * len(PIECES)
+        for piece, pos in self.__piece_positions.items():
+            if pos is None:
+                continue
+            square = pos.y * width + pos.x
+            self.__board[square] = piece.index
+            self.__piece_squares[piece.index] = square
+        self.__hash = zobrist.piece_squares_key(self.__piece_squares)
+        if turn == Color.BLUE:
+            self.__hash ^= zobrist.BLUE_TO_MOVE
+        self.__distances = _DEFAULT_DISTANCES if map is DEFAULT_MAP else _DistanceTables(map)
+        self.__recompute_totals()
+
+    def clone(self) -> "State":
+        """Copy of the mutable position; the Map is shared."""
+        state = State.__new__(State)
+        state.__map = self.__map
+        state.__piece_positions = self.__piece_positions.copy()
+        state.__board = self.__board[:]
+        state.__piece_squares = self.__piece_squares[:]
+        state.__turn = self.__turn
+        state.__hash = self.__hash
+        state.__distances = self.__distances
+        state.__piece_counts = self.__piece_counts[:]
+        state.__material = self.__material[:]
+        state.__den_distance = self.__den_distance[:]
+        state.__centre_distance = self.__centre_distance[:]
+        return state
+
     @staticmethod
     def get_all_pieces() -> List[Piece]:
-        return [
-            Piece(Color.RED, PieceType.ELEPHANT),
-            Piece(Color.RED, PieceType.LION),
-            Piece(Color.RED, PieceType.TIGER),
-            Piece(Color.RED, PieceType.LEOPARD),
-            Piece(Color.RED, PieceType.DOG),
-            Piece(Color.RED, PieceType.WOLF),
-            Piece(Color.RED, PieceType.CAT),
-            Piece(Color.RED, PieceType.MOUSE),
-            Piece(Color.BLUE, PieceType.ELEPHANT),
-            Piece(Color.BLUE, PieceType.LION),
-            Piece(Color.BLUE, PieceType.TIGER),
-            Piece(Color.BLUE, PieceType.LEOPARD),
-            Piece(Color.BLUE, PieceType.DOG),
-            Piece(Color.BLUE, PieceType.WOLF),
-            Piece(Color.BLUE, PieceType.CAT),
-            Piece(Color.BLUE, PieceType.MOUSE),
-        ]
+        return list(PIECES)
 
     def is_alive(self, piece: Piece) -> bool:
         return self.__piece_positions[piece] is not None
@@ -63,10 +121,10 @@ class State:
             raise RuntimeError("Invariant not upheld: The piece is already dead")
         return pos
 
-    def get_adjacent_cells(self, position: Position) -> List[Cell]:
+    def get_adjacent_cells(self, position: Position) -> Tuple[Cell, ...]:
         return self.__map.get_adjacent_cells(position)
 
-    def get_adjacent_non_river_cells(self, position: Position) -> List[Cell]:
+    def get_adjacent_non_river_cells(self, position: Position) -> Tuple[Cell, ...]:
         return self.__map.get_adjacent_non_river_cells(position)
 
     def get_location(self, position: Position) -> Optional[Location]:
@@ -79,23 +137,120 @@ class State:
         return loc
 
     def get_piece_at_position(self, position: Position) -> Optional[Piece]:
-        for piece in self.__piece_positions:
-            pos = self.__piece_positions[piece]
-            if pos == position:
-                return piece
-        return None
+        width = self.__map.width()
+        if not (0 <= position.x < width and 0 <= position.y < self.__map.height()):
+            return None
+        index = self.__board[position.y * width + position.x]
+        return PIECES[index] if index >= 0 else None
+
+    def get_piece_at_square(self, square: int) -> int:
+        return self.__board[square]
+
+    def get_piece_square(self, index: int) -> int:
+        return self.__piece_squares[index]
 
     def set_piece_position(self, piece: Piece, position: Position):
+        index = piece.index
+        color = piece.color.value
+        den = self.__distances.den[color]
+        centre = self.__distances.centre
+        old_square = self.__piece_squares[index]
+        if old_square >= 0:
+            self.__hash ^= zobrist.PIECE_SQUARE[index][old_square]
+            if self.__board[old_square] == index:
+                self.__board[old_square] = -1
+            self.__den_distance[color] -= den[old_square]
+            self.__centre_distance[color] -= centre[old_square]
+        else:
+            self.__piece_counts[color] += 1
+            self.__material[color] += MATERIAL[index]
+        square = position.y * self.__map.width() + position.x
+        self.__board[square] = index
+        self.__piece_squares[index] = square
+        self.__hash ^= zobrist.PIECE_SQUARE[index][square]
         self.__piece_positions[piece] = position
+        self.__den_distance[color] += den[square]
+        self.__centre_distance[color] += centre[square]
 
     def kill_piece(self, piece: Piece):
+        index = piece.index
+        square = self.__piece_squares[index]
+        if square >= 0:
+            color = piece.color.value
+            self.__hash ^= zobrist.PIECE_SQUARE[index][square]
+            if self.__board[square] == index:
+                self.__board[square] = -1
+            self.__piece_counts[color] -= 1
+            self.__material[color] -= MATERIAL[index]
+            self.__den_distance[color] -= self.__distances.den[color][square]
+            self.__centre_distance[color] -= self.__distances.centre[square]
+        self.__piece_squares[index] = -1
         self.__piece_positions[piece] = None
 
     def get_turn(self) -> Color:
         return self.__turn
 
+    def load_piece_squares(self, squares: List[int], turn: Color):
+        """Replace the whole position with `squares` (one per piece index, -1 if dead)."""
+        width = self.__map.width()
+        self.__board = [-1] * len(self.__board)
+        self.__piece_squares = list(squares)
+        for index, square in enumerate(squares):
+            if square < 0:
+                self.__piece_positions[PIECES[index]] = None
+                continue
+            self.__board[square] = index
+            self.__piece_positions[PIECES[index]] = Position(square % width, square // width)
+        self.__turn = turn
+        self.__hash = zobrist.piece_squares_key(self.__piece_squares)
+        if turn == Color.BLUE:
+            self.__hash ^= zobrist.BLUE_TO_MOVE
+        self.__recompute_totals()
+
+    def __recompute_totals(self):
+        self.__piece_counts = [0, 0]
+        self.__material = [0, 0]
+        self.__den_distance = [0, 0]
+        self.__centre_distance = [0, 0]
+        for index, square in enumerate(self.__piece_squares):
+            if square < 0:
+                continue
+            color = PIECES[index].color.value
+            self.__piece_counts[color] += 1
+            self.__material[color] += MATERIAL[index]
+            self.__den_distance[color] += self.__distances.den[color][square]
+            self.__centre_distance[color] += self.__distances.centre[square]
+
+    def get_piece_count(self, color: Color) -> int:
+        return self.__piece_counts[color.value]
+
+    def get_material(self, color: Color) -> int:
+        """Sum of MATERIAL over the live pieces of `color`; level bonuses are not included."""
+        return self.__material[color.value]
+
+    def get_den_distance(self, color: Color) -> int:
+        """Sum over the live pieces of `color` of their row distance to the enemy den."""
+        return self.__den_distance[color.value]
+
+    def get_centre_distance(self, color: Color) -> int:
+        """Sum over the live pieces of `color` of their Manhattan distance to the centre square."""
+        return self.__centre_distance[color.value]
+
+    def get_square_distances(self, color: Color, square: int) -> Tuple[int, int]:
+        """Den and centre distance that a piece of `color` standing on `square` adds to the totals."""
+        return self.__distances.den[color.value][square], self.__distances.centre[square]
+
+    def set_turn(self, turn: Color):
+        if turn != self.__turn:
+            self.__hash ^= zobrist.BLUE_TO_MOVE
+        self.__turn = turn
+
     def next_turn(self):
         self.__turn = Color.BLUE if self.__turn == Color.RED else Color.RED
+        self.__hash ^= zobrist.BLUE_TO_MOVE
+
+    def get_hash(self) -> int:
+        return self.__hash
 
     def get_map(self) -> Map:
         return self.__map
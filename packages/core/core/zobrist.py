@@ -0,0 +1,33 @@
+import random
+from typing import List, Tuple
+
+# Khoá Zobrist 64-bit, sinh từ seed cố định để giống nhau giữa các tiến trình
+# (cần cho bảng khai cuộc, tablebase, ...).
+_rng = random.Random(0x5A0B1D7)
+
+NUM_PIECES = 16
+NUM_SQUARES = 63
+MAX_LEVEL_BONUS = 3
+
+PIECE_SQUARE: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(_rng.getrandbits(64) for _ in range(NUM_SQUARES)) for _ in range(NUM_PIECES)
+)
+# LEVEL_BONUS[piece][0] = 0 để quân chưa nâng cấp không làm đổi khoá
+LEVEL_BONUS: Tuple[Tuple[int, ...], ...] = tuple(
+    (0,) + tuple(_rng.getrandbits(64) for _ in range(MAX_LEVEL_BONUS))
+    for _ in range(NUM_PIECES)
+)
+BLUE_TO_MOVE: int = _rng.getrandbits(64)
+# UPGRADES[color][n]: số lần đã nâng cấp của mỗi bên, UPGRADES[color][0] = 0
+MAX_UPGRADES = 3
+UPGRADES: Tuple[Tuple[int, ...], ...] = tuple(
+    (0,) + tuple(_rng.getrandbits(64) for _ in range(MAX_UPGRADES)) for _ in range(2)
+)
+
+
+def piece_squares_key(squares: List[int]) -> int:
+    key = 0
+    for index, square in enumerate(squares):
+        if square >= 0:
+            key ^= PIECE_SQUARE[index][square]
+    return key
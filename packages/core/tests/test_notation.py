@@ -0,0 +1,28 @@
+import random
+
+from core.game import Game
+from core.notation import START, from_notation, to_notation
+
+
+def test_start_position():
+    game = from_notation(START)
+    assert to_notation(game) == START
+    assert game.get_hash() == Game().get_hash()
+
+
+def test_upgrade_counters_change_the_key():
+    assert from_notation(START).get_hash() != from_notation(START.replace("0-0", "3-0")).get_hash()
+
+
+def test_round_trip_keeps_the_key():
+    rng = random.Random(7)
+    for _ in range(200):
+        game = Game(repetition_limit=0)
+        for _ in range(rng.randint(0, 120)):
+            if game.is_game_over() is not None:
+                break
+            game.make_packed_move(rng.choice(game.legal_moves(game.get_turn())))
+        text = to_notation(game)
+        parsed = from_notation(text)
+        assert to_notation(parsed) == text
+        assert parsed.get_hash() == game.get_hash()
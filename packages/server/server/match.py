@@ -1,5 +1,6 @@
+from dataclasses import dataclass
 from core.game import Game
-from core.map import Color, dataclass
+from core.piece import Color
 from server_types import MatchId, Addr
 
 
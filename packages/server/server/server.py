@@ -1,6 +1,7 @@
 from core.game import Game
 from core.piece import Color, Piece
 from core.map import Position
+from core.move_cache import MoveCache
 from typing import Any, Dict, Optional, Set
 from PodSixNet.Channel import Channel
 from PodSixNet.Server import Server
@@ -50,6 +51,16 @@ class ClientChannel(Channel):
                     }
                 )
 
+        # luật hoà (lặp thế cờ, quá nhiều nước không ăn quân) do server quyết định
+        reason = match.game.get_draw_reason()
+        if reason is not None:
+            for player_addr in match.get_players():
+                if player_addr in self._server.get_registered_clients():
+                    self._server.get_registered_clients()[player_addr].Send(
+                        {"action": "game_over", "winner": None, "reason": reason}
+                    )
+            self._server.end_match(match_id)
+
     def Network_find_game(self, data):
         if self.addr in self._server.get_client_matches():
             self.Send({"action": "error", "message": "Already in a match"})
@@ -170,6 +181,8 @@ class GameServer(Server):
     __pending_clients: Queue[Addr]
     __pending_clients_list: Set[Addr]
     __pending_matches: Dict[MatchId, Dict[str, Any]]
+    # dùng chung cho mọi trận để kiểm tra nước đi
+    __move_cache: MoveCache
 
     def __init__(self, *, ip: str, port: int, listeners=10):
         print(f"Server listening on {ip}:{port}...")
@@ -180,6 +193,7 @@ class GameServer(Server):
         self.__pending_clients = Queue()
         self.__pending_clients_list = set()
         self.__pending_matches = {}
+        self.__move_cache = MoveCache()
 
     def Connected(self, channel: ClientChannel, addr: Addr):
         print(f"Client connected: {addr}")
@@ -306,7 +320,9 @@ class GameServer(Server):
             pending_match = self.__pending_matches[match_id]
             players = pending_match["players"]
 
-            mat = match.Match(match_id, Game(), *players)
+            game = Game()
+            game.move_cache = self.__move_cache
+            mat = match.Match(match_id, game, *players)
 
             self.__matches[match_id] = mat
 